@@ -1,15 +1,20 @@
 """
 Batch benchmark runner on OpenAI API. 
 Runs the game in text mode in a subprocesses and sends the game output to an LLM for next steps.
+With --in-process the games run inside the runner instead (see env.TextSession); the game output is the same.
 
 Usage:
     python benchmark_batch.py --model gpt-5-mini --instances 5 --steps 20
     python benchmark_batch.py --mock --instances 2 --steps 5
+    python benchmark_batch.py --mock --instances 500 --in-process
+    python benchmark_batch.py --driver async --concurrency 16 --instances 50
+    python benchmark_batch.py --mock --instances 2 --record logs
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
 import subprocess
 import sys
 import time
@@ -18,10 +23,24 @@ import json
 import os
 import select
 import codecs
-from typing import Optional, Dict, List, Any
+import functools
+from typing import Optional, Dict, List, Any, Tuple
 from dotenv import load_dotenv
 from textwrap import dedent
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to an estimate
+    tiktoken = None
+
+# env first (it imports game, which silences the pygame banner)
+from env import TextSession
+from game import level_info_text  # type: ignore
+from recipe import load_bounds
+from solver import cached_solve, normalized_score
+from game_utils import list_levels_dir
+from states import Level
 
 # --- Constants & Templates ---
 
@@ -85,12 +104,39 @@ USER_TEMPLATE_COT = dedent("""\
     After your thinking process, provide the next command wrapped in <cmd> </cmd> tags.
 """)
 
+# --prompt-layout prefix: the turn instructions are part of the system prompt,
+# each level opens with its info and every turn is the bare game output
+TURN_INSTRUCTIONS = dedent("""\
+    ## Turns
+    After the level info, every user message is the most recent game output (including the board and any status lines).
+    Choose the single next command without any other text.
+""")
+
+TURN_INSTRUCTIONS_COT = dedent("""\
+    ## Turns
+    After the level info, every user message is the most recent game output (including the board and any status lines).
+    In a systematic manner, plan out your next step.
+    Think about all possible moves from the current game state and select the best one.
+    After your thinking process, provide the next command wrapped in <cmd> </cmd> tags.
+""")
+
+LEVEL_INFO_TEMPLATE = "# Level{info}"
+
 LEVEL_COMPLETE_TEMPLATE = dedent("""\
     Congratulations! You completed the level.
     You now advance to a new, slightly harder level.
     Keep playing!
 """)
 
+# reply of the model in --mock mode
+MOCK_RESPONSE = "Reasoning: Skipping time.\n<cmd>skip</cmd>"
+
+# how much of the conversation each request carries (see GameSession.request_messages)
+HISTORY_POLICIES = ("full", "last", "diff")
+
+GOAL_RE = re.compile(r"Goal achieved: player has item \d+ at time (\d+)")
+BOARD_END_RE = re.compile(r"Time: \d+$")
+
 COMMAND_RE = re.compile(r"(interact)\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)|(info)|(drop)|(skip)", re.IGNORECASE)
 COMMAND_RE_COT = re.compile(r"<cmd>\s*(?:(interact)\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)|(info)|(drop)|(skip))\s*</cmd>", re.IGNORECASE)
 
@@ -118,12 +164,99 @@ def extract_command(text: str, reasoning: bool) -> Optional[str]:
     str_cmd = f"{result[0]}({result[1][0]},{result[1][1]})" if result[0] == "interact" else result[0]
     return str_cmd
 
-def run_game_subprocess(python_exe: str = sys.executable):
+@functools.lru_cache(maxsize=None)
+def _token_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # encodings are downloaded on first use
+        return None
+
+
+@functools.lru_cache(maxsize=65536)
+def _text_tokens(text: str, model: str) -> int:
+    encoding = _token_encoding(model)
+    return len(encoding.encode(text)) if encoding is not None else (len(text) + 3) // 4
+
+
+def count_tokens(messages: List[Dict[str, str]], model: str) -> int:
+    """Prompt tokens of a chat request: tiktoken if installed, else about 4 characters per token."""
+    # the reply is primed with <|start|>assistant<|message|>, each message adds 3 tokens of framing
+    return 3 + sum(3 + _text_tokens(message["content"], model) for message in messages)
+
+
+def shared_prefix(previous: List[Dict[str, str]], messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """The leading messages of `messages` that `previous` starts with too."""
+    n = 0
+    for old, new in zip(previous, messages):
+        if old != new:
+            break
+        n += 1
+    return messages[:n]
+
+
+@functools.lru_cache(maxsize=None)
+def level_info(level: str) -> str:
+    """The level info the game prints when `level` starts (see game.level_info_text)."""
+    return level_info_text(Level.load_from_folder(level))
+
+
+def label_board_rows(text: str) -> List[str]:
+    """Lines of the game output `text`, board rows prefixed with their y.
+
+    A board is the run of equally wide lines without spaces printed right
+    before a "Time: <n>" line.
+    """
+    lines = text.splitlines()
+    for end, line in enumerate(lines):
+        if not BOARD_END_RE.match(line) or end == 0:
+            continue
+        width = len(lines[end - 1])
+        start = end
+        while start > 0 and len(lines[start - 1]) == width and " " not in lines[start - 1]:
+            start -= 1
+        for y in range(end - start):
+            lines[start + y] = f"row {y}: {lines[start + y]}"
+    return lines
+
+
+def compact_observation(previous: str, current: str) -> str:
+    """The lines of the game output `current` that `previous` does not have.
+
+    Board rows are compared and shown with their row number, so a changed
+    row says where it is on the board.
+    """
+    # the board is printed again after some messages; repeats are dropped too
+    seen = set(label_board_rows(previous))
+    changed = []
+    for line in label_board_rows(current):
+        if line not in seen:
+            seen.add(line)
+            changed.append(line)
+    if not changed:
+        return "The game output did not change."
+    return "Changed lines of the game output:\n" + "\n".join(changed)
+
+
+def run_game_subprocess(
+    python_exe: str = sys.executable,
+    levels_dir: str = "levels",
+    record_dir: Optional[str] = None,
+    show_distances: bool = False,
+):
     """Start a subprocess that runs the text-mode game in BINARY mode."""
     env = os.environ.copy()
     env["PYTHONUNBUFFERED"] = "1"
     
-    cmd = [python_exe, "-u", "-m", "game"]
+    cmd = [python_exe, "-u", "-m", "game", levels_dir]
+    if record_dir is not None:
+        cmd += ["--record", record_dir]
+    if show_distances:
+        cmd.append("--show-distances")
     p = subprocess.Popen(
         cmd,
         stdin=subprocess.PIPE,
@@ -180,12 +313,66 @@ def read_until_prompt(proc, timeout: float = 10.0) -> Optional[str]:
         else:
             continue
 
+class SubprocessGame:
+    """Text-mode game in a `python -m game` subprocess, behind the `TextSession` interface."""
+
+    def __init__(self, levels_dir: str = "levels", record_dir: Optional[str] = None, show_distances: bool = False):
+        self.record_dir = record_dir
+        self.proc = run_game_subprocess(levels_dir=levels_dir, record_dir=record_dir, show_distances=show_distances)
+
+    @property
+    def running(self) -> bool:
+        return self.proc.poll() is None
+
+    def read(self) -> Optional[str]:
+        return read_until_prompt(self.proc, timeout=10.0)
+
+    def send(self, line: str) -> None:
+        # We must encode to bytes for binary stdin
+        self.proc.stdin.write((line + "\n").encode('utf-8'))
+        self.proc.stdin.flush()
+
+    def close(self) -> None:
+        if self.proc.poll() is None:
+            if self.record_dir is not None:
+                # end of input lets the game save the log of the level in progress
+                self.proc.stdin.close()
+                try:
+                    self.proc.wait(timeout=10)
+                    return
+                except subprocess.TimeoutExpired:
+                    pass
+            self.proc.kill()
+
+
+def load_references(levels: List[str], max_expansions: Optional[int]) -> Dict[str, Optional[int]]:
+    """Optimal game time per level folder, solved once and cached on disk (see solver.py)."""
+    references = {}
+    for level in levels:
+        result = cached_solve(level, max_expansions)
+        references[level] = result.optimal_time
+        print(f"Reference for {level}: {result.status} {result.optimal_time}")
+    return references
+
+
 class GameSession:
-    """Manages a single game process and its conversation history."""
-    def __init__(self, index: int, args):
+    """Manages a single game (subprocess or in-process) and its conversation history."""
+    def __init__(
+        self,
+        index: int,
+        args,
+        levels: List[str] | None = None,
+        references: Dict[str, Optional[int]] | None = None,
+        bounds: Dict[str, Optional[float]] | None = None,
+    ):
         self.index = index
         self.id = f"game_{index}"
-        self.proc = run_game_subprocess()
+        # command logs of each game go to their own folder (see replay.py)
+        record_dir = None if args.record is None else os.path.join(args.record, self.id)
+        if args.in_process:
+            self.game = TextSession(args.levels, record_dir=record_dir, show_distances=args.show_distances)
+        else:
+            self.game = SubprocessGame(args.levels, record_dir=record_dir, show_distances=args.show_distances)
         self.history: List[Dict[str, str]] = []
         self.steps = 0
         self.finished = False
@@ -194,18 +381,67 @@ class GameSession:
         system_prompt = SYSTEM_PROMPT.format(
             controls=CONTROL_INFO_PATHFIND_COT if args.cot else CONTROL_INFO_PATHFIND
         )
+        if args.prompt_layout == "prefix":
+            system_prompt += "\n" + (TURN_INSTRUCTIONS_COT if args.cot else TURN_INSTRUCTIONS)
         self.history.append({
             "role": "user" if any(x in args.model for x in ["gemma", "qwen"]) else "system",
             "content": system_prompt,
         })
         self.user_template = USER_TEMPLATE_COT if args.cot else USER_TEMPLATE
+        # the game plays the levels in order and continues automatically
+        self.levels = levels or []
+        self.references = references or {}
+        self.bounds = bounds or {}
+        self.level_idx = 0
+        self.results: List[Dict[str, Any]] = []
+        # history index -> game output shown in that message, and its compact form
+        self.observations: Dict[int, str] = {}
+        self.compacted: Dict[int, str] = {}
+        # history index of the first game output of the current level (with the level info)
+        self.level_start: Optional[int] = None
+        # history policy -> prompt tokens of every request, and how many of
+        # them open the previous request too (what a prefix cache can reuse)
+        self.prompt_tokens: Dict[str, List[int]] = {policy: [] for policy in HISTORY_POLICIES}
+        self.prefix_tokens: Dict[str, List[int]] = {policy: [] for policy in HISTORY_POLICIES}
+        self.last_requests: Dict[str, List[Dict[str, str]]] = {}
+        # prompt and cached tokens reported by the API, per request
+        self.usage: List[Dict[str, int]] = []
+
+    def record_goals(self, captured: str):
+        """Score every level completed in `captured` against its reference optimum.
+
+        `gap` is the game time spent over the level's lower bound (see
+        recipe.py): available without a solver run and never smaller than
+        the distance to the optimum.
+        """
+        for match in GOAL_RE.finditer(captured):
+            game_time = int(match.group(1))
+            level = self.levels[self.level_idx] if self.level_idx < len(self.levels) else None
+            optimal = self.references.get(level)
+            score = None if optimal is None else normalized_score(optimal, game_time)
+            bound = self.bounds.get(level)
+            if bound == float("inf"):
+                bound = None
+            gap = None if bound is None else game_time - bound
+            self.results.append({
+                "level": level,
+                "game_time": game_time,
+                "optimal_time": optimal,
+                "score": score,
+                "lower_bound": bound,
+                "gap": gap,
+            })
+            print(f"[{self.id}] Completed {level} at time {game_time} (optimal {optimal}, score {score}, gap {gap})")
+            self.level_idx += 1
 
     def advance_to_prompt(self) -> str:
         """Reads game output up to the user prompt."""
-        captured = read_until_prompt(self.proc, timeout=10.0)
+        captured = self.game.read()
         print(captured)
+        if captured:
+            self.record_goals(captured)
         if not captured:
-            if self.proc.poll() is not None:
+            if not self.game.running:
                 self.finished = True
             return ""
 
@@ -213,14 +449,84 @@ class GameSession:
             self.history.append({"role": "user", "content": LEVEL_COMPLETE_TEMPLATE})
             return captured
         
-        msg_content = self.user_template.format(game_output=captured)
+        observation = captured
+        if not self.observations or GOAL_RE.search(captured):
+            self.level_start = len(self.history)
+            if self.args.prompt_layout == "prefix" and self.level_idx < len(self.levels):
+                # the same message opens the level in every session; the
+                # game output keeps only what follows the info
+                info = level_info(self.levels[self.level_idx])
+                self.history.append({"role": "user", "content": LEVEL_INFO_TEMPLATE.format(info=info)})
+                observation = captured.replace(info, "", 1)
+        if self.args.prompt_layout == "prefix":
+            msg_content = observation
+        else:
+            msg_content = self.user_template.format(game_output=captured)
+        self.observations[len(self.history)] = observation
         self.history.append({"role": "user", "content": msg_content})
+        if self.finished:
+            # the step limit is reached; no request follows
+            return captured
+        for policy in HISTORY_POLICIES:
+            messages = self.request_messages(policy)
+            self.prompt_tokens[policy].append(count_tokens(messages, self.args.model))
+            prefix = shared_prefix(self.last_requests.get(policy, []), messages)
+            self.prefix_tokens[policy].append(count_tokens(prefix, self.args.model) if prefix else 0)
+            self.last_requests[policy] = list(messages)
         return captured
 
+    def record_usage(self, usage: Optional[Dict[str, Any]]):
+        """Keep the prompt and cached token counts the API reported for one request."""
+        if not usage:
+            return
+        details = usage.get("prompt_tokens_details") or {}
+        self.usage.append({
+            "prompt_tokens": usage.get("prompt_tokens") or 0,
+            "cached_tokens": details.get("cached_tokens") or 0,
+        })
+
+    def request_messages(self, policy: Optional[str] = None) -> List[Dict[str, str]]:
+        """Messages of the next request under a history policy (default: --history).
+
+        - full: the whole conversation
+        - last: the system prompt, the start of the current level (its
+          level info) and the last K turns
+        - diff: like last, plus the earlier turns of the level with every
+          game output but the first cut down to the lines that changed
+        """
+        policy = policy or self.args.history
+        if policy == "full":
+            return self.history
+        # the current observation and the K turns before it: the window
+        # starts right after the reply K + 1 turns back, so it never opens
+        # with a reply, however many messages an observation takes
+        replies = [i for i, message in enumerate(self.history) if message["role"] == "assistant"]
+        turns = self.args.history_turns
+        recent = replies[-turns - 1] + 1 if len(replies) > turns else 1
+        level_info = self.level_start if self.level_start is not None and self.level_start < recent else None
+        messages = [self.history[0]]
+        if level_info is not None:
+            messages.append(self.history[level_info])
+        if policy == "diff" and level_info is not None:
+            messages.extend(self._compact_message(i) for i in range(level_info + 1, recent))
+        messages.extend(self.history[recent:])
+        return messages
+
+    def _compact_message(self, index: int) -> Dict[str, str]:
+        message = self.history[index]
+        if index not in self.observations:
+            return message
+        if index not in self.compacted:
+            # the first game output of the level stays whole
+            previous = next((self.observations[i] for i in range(index - 1, self.level_start - 1, -1) if i in self.observations), None)
+            current = self.observations[index]
+            self.compacted[index] = current if previous is None else compact_observation(previous, current)
+        return {"role": "user", "content": self.compacted[index]}
+
     def get_last_request_body(self) -> Dict[str, Any]:
         return {
             "model": self.args.model,
-            "messages": self.history,
+            "messages": self.request_messages(),
         }
 
     def apply_command(self, raw_output: str):
@@ -234,11 +540,9 @@ class GameSession:
         print(f"[{self.id}] LLM ({self.steps}) -> {cmd}")
         
         try:
-            # We must encode to bytes for binary stdin
-            self.proc.stdin.write((cmd + "\n").encode('utf-8'))
-            self.proc.stdin.flush()
+            self.game.send(cmd)
         except Exception as e:
-            print(f"[{self.id}] Failed to write to stdin: {e}")
+            print(f"[{self.id}] Failed to send command: {e}")
             self.finished = True
             return
 
@@ -250,10 +554,262 @@ class GameSession:
             self.finished = True
 
     def close(self):
-        if self.proc.poll() is None:
-            self.proc.kill()
+        self.game.close()
         with open(f"transcript_{self.id}.json", "w+") as f:
             json.dump(self.history, f, indent=4)
+        if self.results:
+            with open(f"scores_{self.id}.json", "w+") as f:
+                json.dump(self.results, f, indent=4)
+        if self.usage:
+            with open(f"usage_{self.id}.json", "w+") as f:
+                json.dump(self.usage, f, indent=4)
+
+def batch_request(session: GameSession) -> Dict[str, Any]:
+    """One line of a Batch API input file: the next completion for `session`."""
+    return {
+        "custom_id": session.id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": session.get_last_request_body(),
+    }
+
+
+def submit_batch(client: OpenAI, lines: List[Dict[str, Any]], name: str):
+    """Upload `lines` as a JSONL file and start a Batch API job on it."""
+    jsonl_filename = f"batch_input_{name}.jsonl"
+    with open(jsonl_filename, "w") as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+
+    print(f"Uploading batch file {jsonl_filename}...")
+    with open(jsonl_filename, "rb") as f:
+        batch_input_file = client.files.create(file=f, purpose="batch")
+    os.remove(jsonl_filename)
+
+    print("Creating batch job...")
+    return client.batches.create(
+        input_file_id=batch_input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata={"description": name},
+    )
+
+
+class RollingBatchScheduler:
+    """Keeps Batch API jobs in flight and refills them as sessions become ready.
+
+    A session joins the queue as soon as its previous reply is applied.
+    Queued requests go out as one job once `batch_size` of them are
+    waiting, the oldest has waited `batch_wait` seconds, or nothing else is
+    in flight; at most `max_in_flight` requests are submitted at a time.
+    Requests that fail are queued again, up to `MAX_ATTEMPTS` times.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, sessions: List[GameSession], client: Optional[OpenAI], args):
+        self.sessions = sessions
+        self.client = client
+        self.args = args
+        # sessions waiting for a batch, with the time they joined the queue
+        self.queue: List[Tuple[GameSession, float]] = []
+        # job id -> (batch job or mock due time, sessions in it)
+        self.jobs: Dict[str, Tuple[Any, List[GameSession]]] = {}
+        self.attempts: Dict[str, int] = {}
+        self.submitted = 0
+        self.requests = 0
+
+    def run(self):
+        for session in self.sessions:
+            self._advance(session)
+        while self.queue or self.jobs:
+            self._submit_due()
+            if not self._collect():
+                time.sleep(self._idle_time())
+        print(f"Submitted {self.requests} requests in {self.submitted} batches")
+
+    def _in_flight(self) -> int:
+        return sum(len(members) for _, members in self.jobs.values())
+
+    def _advance(self, session: GameSession):
+        session.advance_to_prompt()
+        if session.finished:
+            print(f"{session.id} finished locally.")
+            session.close()
+            return
+        self._enqueue(session)
+
+    def _enqueue(self, session: GameSession):
+        self.queue.append((session, time.time()))
+
+    def _submit_due(self):
+        args = self.args
+        while self.queue:
+            room = args.max_in_flight - self._in_flight()
+            if room <= 0:
+                return
+            waited = time.time() - self.queue[0][1]
+            if len(self.queue) < args.batch_size and waited < args.batch_wait and self.jobs:
+                return
+            members = [session for session, _ in self.queue[:min(args.batch_size, room)]]
+            self.queue = self.queue[len(members):]
+            name = f"game_step_{self.submitted}"
+            if self.client is None:
+                job_id, job = f"mock_{self.submitted}", time.time() + args.mock_latency
+            else:
+                job = submit_batch(self.client, [batch_request(s) for s in members], name)
+                job_id = job.id
+            print(f"Batch {job_id} submitted with {len(members)} requests ({self._in_flight() + len(members)} in flight)")
+            self.jobs[job_id] = (job, members)
+            self.submitted += 1
+            self.requests += len(members)
+
+    def _collect(self) -> bool:
+        """Apply the replies of finished jobs; True if any job finished."""
+        done = False
+        for job_id, (job, members) in list(self.jobs.items()):
+            replies = self._replies(job_id, job, members)
+            if replies is None:
+                continue
+            del self.jobs[job_id]
+            done = True
+            for session in members:
+                body = replies.get(session.id)
+                content = None
+                if body is not None:
+                    try:
+                        content = body["choices"][0]["message"]["content"]
+                    except (KeyError, IndexError, TypeError) as e:
+                        print(f"Error processing result for {session.id}: {e}")
+                if content is not None:
+                    self.attempts.pop(session.id, None)
+                    session.record_usage(body.get("usage"))
+                    session.apply_command(content)
+                    self._advance(session)
+                    continue
+                self.attempts[session.id] = self.attempts.get(session.id, 0) + 1
+                if self.attempts[session.id] >= self.MAX_ATTEMPTS:
+                    print(f"[{session.id}] Giving up after {self.MAX_ATTEMPTS} failed requests")
+                    session.finished = True
+                    session.close()
+                else:
+                    self._enqueue(session)
+        return done
+
+    def _replies(self, job_id: str, job, members: List[GameSession]) -> Optional[Dict[str, Any]]:
+        """Response body per session id once `job` has ended (missing on error), else None."""
+        if self.client is None:
+            if time.time() < job:
+                return None
+            return {session.id: {"choices": [{"message": {"content": MOCK_RESPONSE}}]} for session in members}
+        batch_status = self.client.batches.retrieve(job_id)
+        if batch_status.status in ["failed", "expired", "cancelled"]:
+            print(f"Batch {job_id} failed: {batch_status.status}")
+            return {}
+        if batch_status.status != "completed":
+            return None
+        replies = {}
+        if batch_status.output_file_id:
+            for line in self.client.files.content(batch_status.output_file_id).text.strip().split("\n"):
+                res = json.loads(line)
+                body = (res.get("response") or {}).get("body")
+                if body is not None:
+                    replies[res["custom_id"]] = body
+        if batch_status.error_file_id:
+            for line in self.client.files.content(batch_status.error_file_id).text.strip().split("\n"):
+                print(f"Batch {job_id} error: {line}")
+        return replies
+
+    def _idle_time(self) -> float:
+        """Seconds to sleep before polling again, waking up for a due partial batch."""
+        wait = self.args.poll_interval
+        if self.queue:
+            wait = min(wait, max(0.0, self.queue[0][1] + self.args.batch_wait - time.time()))
+        if self.client is None and self.jobs:
+            wait = min(wait, max(0.0, min(job for job, _ in self.jobs.values()) - time.time()))
+        return wait
+
+
+def report_tokens(sessions: List[GameSession]):
+    """Print the prompt tokens every history policy would have sent, and the API's cache hits.
+
+    `prefix` is the share of prompt tokens in messages that also opened the
+    session's previous request, the most a prefix cache could serve.
+    """
+    requests = sum(len(s.prompt_tokens["full"]) for s in sessions)
+    if requests:
+        counter = "tiktoken" if tiktoken is not None else "estimated"
+        print(f"Prompt tokens over {requests} requests ({counter}):")
+        for policy in HISTORY_POLICIES:
+            total = sum(sum(s.prompt_tokens[policy]) for s in sessions)
+            peak = max(max(s.prompt_tokens[policy], default=0) for s in sessions)
+            prefix = sum(sum(s.prefix_tokens[policy]) for s in sessions)
+            print(f"  {policy}: total {total}, mean {total / requests:.0f}, max {peak}, prefix {prefix / max(total, 1):.1%}")
+    usage = [u for s in sessions for u in s.usage]
+    if usage:
+        prompt = sum(u["prompt_tokens"] for u in usage)
+        cached = sum(u["cached_tokens"] for u in usage)
+        print(f"Cached prompt tokens over {len(usage)} requests: {cached} of {prompt} ({cached / max(prompt, 1):.1%})")
+
+
+ASYNC_MAX_ATTEMPTS = 3
+ASYNC_RETRY_DELAY = 2.0
+
+
+async def request_async(session: GameSession, client: Optional[AsyncOpenAI], semaphore: asyncio.Semaphore, args) -> Optional[str]:
+    """Reply to the pending request of `session`, or None once every attempt failed.
+
+    A failed request is tried again up to `ASYNC_MAX_ATTEMPTS` times in
+    all, after `ASYNC_RETRY_DELAY` seconds and twice as long before each
+    next attempt; waiting does not hold a slot of the semaphore.
+    """
+    for attempt in range(ASYNC_MAX_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(ASYNC_RETRY_DELAY * 2 ** (attempt - 1))
+        async with semaphore:
+            if client is None:
+                await asyncio.sleep(args.mock_latency)
+                return MOCK_RESPONSE
+            try:
+                response = await client.chat.completions.create(**session.get_last_request_body())
+            except Exception as e:
+                print(f"[{session.id}] Request failed: {e}")
+                continue
+        session.record_usage(response.usage.model_dump() if response.usage is not None else None)
+        return response.choices[0].message.content or ""
+    print(f"[{session.id}] Giving up after {ASYNC_MAX_ATTEMPTS} failed requests")
+    return None
+
+
+async def run_session_async(session: GameSession, client: Optional[AsyncOpenAI], semaphore: asyncio.Semaphore, args):
+    """Play one session to the end, one chat completion per step.
+
+    The session advances as soon as its own completion arrives; the
+    semaphore bounds the requests in flight across all sessions. The game
+    ends early only when a request keeps failing (see `request_async`).
+    """
+    while True:
+        if args.in_process:
+            # TextSession captures stdout, which threads would interleave
+            session.advance_to_prompt()
+        else:
+            await asyncio.to_thread(session.advance_to_prompt)
+        if session.finished:
+            print(f"{session.id} finished locally.")
+            break
+        content = await request_async(session, client, semaphore, args)
+        if content is None:
+            break
+        session.apply_command(content)
+    session.close()
+
+
+async def run_async(sessions: List[GameSession], args):
+    """Drive all sessions concurrently against the real-time chat API (or the mock)."""
+    client = None if args.mock else AsyncOpenAI()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    await asyncio.gather(*(run_session_async(s, client, semaphore, args) for s in sessions))
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -262,20 +818,50 @@ def main():
     parser.add_argument("--instances", type=int, default=1, help="Number of concurrent instances")
     parser.add_argument("--cot", action="store_true", default=False, help="Enable Chain of Thought")
     parser.add_argument("--mock", action="store_true", help="Run in mock mode")
+    parser.add_argument("--solver-budget", type=int, default=50000, help="Max expanded states when solving a level for its reference time (0: no solver, lower bounds only)")
+    parser.add_argument("--levels", type=str, default="levels", help="Levels folder or level pack (.zip)")
+    parser.add_argument("--history", choices=HISTORY_POLICIES, default="full", help="How much of the conversation each request carries")
+    parser.add_argument(
+        "--prompt-layout", choices=["inline", "prefix"], default="inline",
+        help="Wrap every game output in the turn instructions, or keep them and the level info in a fixed prefix",
+    )
+    parser.add_argument("--history-turns", type=int, default=10, help="Turns kept verbatim by the last and diff history policies")
+    parser.add_argument("--in-process", action="store_true", help="Run the games inside this process instead of one subprocess each")
+    parser.add_argument("--record", metavar="DIR", help="Write command logs of every game to DIR/game_<n> (see replay.py)")
+    parser.add_argument("--show-distances", action="store_true", help="Show the model the walking distance to every interactable")
+    parser.add_argument(
+        "--driver", choices=["batch", "rolling", "async"], default="batch",
+        help="OpenAI Batch API in lockstep rounds, Batch API jobs refilled as games become ready, or real-time requests with asyncio",
+    )
+    parser.add_argument("--batch-size", type=int, default=100, help="Requests per batch job with --driver rolling")
+    parser.add_argument("--batch-wait", type=float, default=60.0, help="Max seconds a request waits for its batch to fill with --driver rolling")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Max submitted requests without a reply with --driver rolling")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between batch status checks with --driver rolling")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max requests in flight with --driver async")
+    parser.add_argument("--mock-latency", type=float, default=1.0, help="Seconds a mock request takes")
     args = parser.parse_args()
 
     load_dotenv()
     client = None
-    if not args.mock:
+    if not args.mock and args.driver != "async":
         client = OpenAI()
 
     print(f"Starting {args.instances} game instances (Mock: {args.mock})...")
-    sessions = [GameSession(i, args) for i in range(args.instances)]
+    levels = list_levels_dir(args.levels)
+    references = load_references(levels, args.solver_budget) if args.solver_budget else {}
+    bounds = load_bounds(levels)
+    sessions = [GameSession(i, args, levels, references, bounds) for i in range(args.instances)]
     active_sessions = {s.id: s for s in sessions}
 
     batch_counter = 0
 
     try:
+        if args.driver == "async":
+            asyncio.run(run_async(sessions, args))
+            return
+        if args.driver == "rolling":
+            RollingBatchScheduler(sessions, client, args).run()
+            return
         while active_sessions:
             print(f"\n--- Batch Step {batch_counter} ---")
             batch_inputs = []
@@ -292,14 +878,7 @@ def main():
                     continue
                 
                 if not args.mock:
-                    request_body = session.get_last_request_body()
-                    batch_line = {
-                        "custom_id": sess_id,
-                        "method": "POST",
-                        "url": "/v1/chat/completions",
-                        "body": request_body
-                    }
-                    batch_inputs.append(batch_line)
+                    batch_inputs.append(batch_request(session))
                 else:
                     batch_inputs.append(sess_id)
 
@@ -316,7 +895,7 @@ def main():
 
             if args.mock:
                 print("MOCK MODE: Simulating batch processing...")
-                time.sleep(1) 
+                time.sleep(args.mock_latency)
                 for sess_id in batch_inputs:
                     results_map[sess_id] = {
                         "custom_id": sess_id,
@@ -324,7 +903,7 @@ def main():
                             "body": {
                                 "choices": [{
                                     "message": {
-                                        "content": "Reasoning: Skipping time.\n<cmd>skip</cmd>"
+                                        "content": MOCK_RESPONSE
                                     }
                                 }]
                             }
@@ -332,24 +911,7 @@ def main():
                     }
             else:
                 # Real API Logic
-                jsonl_filename = f"batch_input_{batch_counter}.jsonl"
-                with open(jsonl_filename, "w") as f:
-                    for line in batch_inputs:
-                        f.write(json.dumps(line) + "\n")
-                
-                print(f"Uploading batch file {jsonl_filename}...")
-                batch_input_file = client.files.create(
-                    file=open(jsonl_filename, "rb"),
-                    purpose="batch"
-                )
-
-                print("Creating batch job...")
-                batch_job = client.batches.create(
-                    input_file_id=batch_input_file.id,
-                    endpoint="/v1/chat/completions",
-                    completion_window="24h",
-                    metadata={"description": f"game_step_{batch_counter}"}
-                )
+                batch_job = submit_batch(client, batch_inputs, f"game_step_{batch_counter}")
                 print(f"Batch {batch_job.id} submitted. Waiting...")
 
                 while True:
@@ -397,13 +959,13 @@ def main():
                     print("--------------------")
                     # Stop execution since the batch failed
                     raise RuntimeError("Batch processing failed. See errors above.")
-                os.remove(jsonl_filename)
             # 3. Apply results
             for sess_id, result in results_map.items():
                 if sess_id in active_sessions:
                     try:
                         choice = result['response']['body']['choices'][0]
                         content = choice['message']['content']
+                        active_sessions[sess_id].record_usage(result['response']['body'].get('usage'))
                         active_sessions[sess_id].apply_command(content)
                     except Exception as e:
                         print(f"Error processing result for {sess_id}: {e}")
@@ -416,6 +978,7 @@ def main():
         print("Cleaning up processes...")
         for s in sessions:
             s.close()
+        report_tokens(sessions)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,15 @@
-from blocks import Block, Floor  
-from typing import List
+import heapq
+from blocks import Block, Floor
+from typing import Iterator, List
 from dataclasses import dataclass
-from collections import deque
-from enum import Enum
+
+from tilemap import TileMap
+
+
+# grids with at least this many tiles are searched through a ClusterGraph
+HIERARCHY_MIN_TILES = 250_000
+# side length of the square clusters of a ClusterGraph
+CLUSTER_SIZE = 32
 
 
 @dataclass
@@ -11,23 +18,48 @@ class Position:
     y: int
 
 
-@dataclass
-class queueStruct:
-    pos: Position
-    distance: int
+def search_mask(grid: List[List[Block]]) -> bytearray:
+    """Flat walkability mask used by the searches below.
 
+    One byte per tile in row-major order (1 = floor), followed by one padding
+    row of zeros so that `index + width` never runs off the end. Row 0 and
+    column 0 are zeroed: the search never steps onto them, and a zero in
+    column 0 also stops `index + 1` from wrapping from the end of one row to
+    the start of the next.
+    """
+    width = len(grid[0])
+    height = len(grid)
+    if isinstance(grid, TileMap):
+        mask = grid.walkable_mask()
+    else:
+        mask = bytearray(isinstance(block, Floor) for row in grid for block in row)
+    mask.extend(bytes(width))
+    mask[:width] = bytes(width)
+    mask[0::width] = bytes(height + 1)
+    return mask
 
-class State(Enum):
-    NOT_FOUND = 0
-    CLOSED = 1
-    OPEN = 2
-    NOT_INTERACTABLE = 4  # ?
+
+def _neighbors(index: int, width: int, size: int):
+    """In-bounds neighbour indexes of `index` in left, right, up, down order."""
+    x = index % width
+    if x > 0:
+        yield index - 1
+    if x < width - 1:
+        yield index + 1
+    if index >= width:
+        yield index - width
+    if index + width < size:
+        yield index + width
 
 
 def pathfind_neighbor_any(
-    grid: List[List[Block]], playerStart: Position, toFind: Position
+    grid: List[List[Block]], playerStart: Position, toFind: Position, hierarchy: bool = True
 ) -> tuple[int, Position]:
-    """Finds shortest path to any block next to the specified block."""
+    """Finds shortest path to any block next to the specified block.
+
+    Grids of at least HIERARCHY_MIN_TILES tiles are searched through their
+    ClusterGraph unless `hierarchy` is False; the result is the same.
+    """
     if (
         playerStart == toFind
         or len(grid) <= 0
@@ -39,46 +71,336 @@ def pathfind_neighbor_any(
     ):
         return -1, Position(-1, -1)
 
-    q_nextPosition: deque["queueStruct"] = deque()
-    q_nextPosition.appendleft(queueStruct(playerStart, 0))
-
-    # init grid
-    m_grid: List[List[State]] = []
-
-    for y, row in enumerate(grid):
-        lst: List[State] = []
-        for x, block in enumerate(row):
-            if isinstance(block, Floor):
-                lst.append(State.NOT_FOUND)
-            else:
-                lst.append(State.NOT_INTERACTABLE)
-        m_grid.append(lst)
-
-    while q_nextPosition:
-        nextBlock = q_nextPosition.pop()
-        pos = nextBlock.pos
-
-        for neighb_pos in [
-            Position(pos.x - 1, pos.y),
-            Position(pos.x + 1, pos.y),
-            Position(pos.x, pos.y - 1),
-            Position(pos.x, pos.y + 1),
-        ]:
-            if neighb_pos == toFind:  # end
-                return nextBlock.distance, pos
-
-            if (
-                m_grid[neighb_pos.y][neighb_pos.x] == State.NOT_FOUND
-                and neighb_pos.x > 0
-                and neighb_pos.y > 0
-                and neighb_pos.x < len(grid[0])
-                and neighb_pos.y < len(grid)
-            ):
-                q_nextPosition.appendleft(
-                    queueStruct(neighb_pos, nextBlock.distance + 1)
-                )
-                m_grid[neighb_pos.y][neighb_pos.x] = State.OPEN
-
-        m_grid[pos.y][pos.x] = State.CLOSED
+    width = len(grid[0])
+    size = width * len(grid)
+    goal = toFind.y * width + toFind.x
+    # tiles from which the target is in reach
+    approach = set(_neighbors(goal, width, size))
+
+    start = playerStart.y * width + playerStart.x
+    if start in approach:
+        return 0, Position(playerStart.x, playerStart.y)
+
+    if hierarchy and size >= HIERARCHY_MIN_TILES and 0 <= playerStart.x < width and 0 <= playerStart.y < len(grid):
+        graph = cluster_graph(grid)
+        if graph.worthwhile:
+            distance, arrivals = graph.route(start, approach)
+            if distance < 0:
+                return -1, Position(-1, -1)
+            # with several arrival tiles at the same distance, which one the
+            # search meets first depends on its expansion order: run it
+            if len(arrivals) == 1:
+                return distance, Position(arrivals[0] % width, arrivals[0] // width)
+
+    mask = search_mask(grid)
+    mask[start] = 0
+    # the start tile may lie on the border, so its neighbours are bounds-checked;
+    # every later tile is off row/column 0 and the padded mask guards the rest
+    frontier = []
+    for n in _neighbors(start, width, size):
+        if mask[n]:
+            mask[n] = 0
+            frontier.append(n)
+
+    distance = 1
+    offsets = (-1, 1, -width, width)
+    while frontier:
+        next_frontier = []
+        for index in frontier:
+            if index in approach:
+                return distance, Position(index % width, index // width)
+            for offset in offsets:
+                n = index + offset
+                if mask[n]:
+                    mask[n] = 0
+                    next_frontier.append(n)
+        frontier = next_frontier
+        distance += 1
 
     return -1, Position(-1, -1)
+
+
+def iter_path(
+    grid: List[List[Block]], playerStart: Position, toFind: Position
+) -> Iterator[Position]:
+    """Yields the tiles walked along the route `pathfind_neighbor_any` picks.
+
+    One position per step, ending on the tile next to `toFind` that
+    `pathfind_neighbor_any` returns; the start tile is not included. Yields
+    nothing when the player already stands there or there is no route. The
+    search keeps a parent pointer per visited tile and runs on the first
+    `next()`.
+    """
+    if (
+        playerStart == toFind
+        or len(grid) <= 0
+        or len(grid[0]) <= 0
+        or toFind.x < 0
+        or toFind.y < 0
+        or toFind.x >= len(grid[0])
+        or toFind.y >= len(grid)
+    ):
+        return
+
+    width = len(grid[0])
+    size = width * len(grid)
+    approach = set(_neighbors(toFind.y * width + toFind.x, width, size))
+    start = playerStart.y * width + playerStart.x
+    if start in approach:
+        return
+
+    mask = search_mask(grid)
+    mask[start] = 0
+    parents: dict[int, int] = {}
+    frontier = []
+    for n in _neighbors(start, width, size):
+        if mask[n]:
+            mask[n] = 0
+            parents[n] = start
+            frontier.append(n)
+
+    offsets = (-1, 1, -width, width)
+    end = None
+    while frontier and end is None:
+        next_frontier = []
+        for index in frontier:
+            if index in approach:
+                end = index
+                break
+            for offset in offsets:
+                n = index + offset
+                if mask[n]:
+                    mask[n] = 0
+                    parents[n] = index
+                    next_frontier.append(n)
+        frontier = next_frontier
+    if end is None:
+        return
+
+    steps = []
+    while end != start:
+        steps.append(end)
+        end = parents[end]
+    for index in reversed(steps):
+        yield Position(index % width, index // width)
+
+
+def neighbor_routes(
+    grid: List[List[Block]], playerStart: Position, targets
+) -> dict[tuple[int, int], tuple[int, Position]]:
+    """Runs the search of `pathfind_neighbor_any` once for many blocks.
+
+    Returns {(x, y): (distance, position)} for every reachable position in
+    `targets`, each entry equal to what `pathfind_neighbor_any` returns for
+    that block (same expansion order, so ties resolve the same way).
+    """
+    width = len(grid[0]) if len(grid) > 0 else 0
+    routes: dict[tuple[int, int], tuple[int, Position]] = {}
+    if width <= 0:
+        return routes
+    size = width * len(grid)
+
+    # approach tile index -> targets it is next to
+    pending: dict[int, list[tuple[int, int]]] = {}
+    for x, y in targets:
+        if (x, y) == (playerStart.x, playerStart.y):
+            continue
+        for n in _neighbors(y * width + x, width, size):
+            pending.setdefault(n, []).append((x, y))
+    if not pending:
+        return routes
+    remaining = len({target for found in pending.values() for target in found})
+
+    def visit(index: int, distance: int) -> None:
+        nonlocal remaining
+        for target in pending.pop(index, ()):
+            if target not in routes:
+                routes[target] = (distance, Position(index % width, index // width))
+                remaining -= 1
+
+    start = playerStart.y * width + playerStart.x
+    visit(start, 0)
+    mask = search_mask(grid)
+    mask[start] = 0
+    frontier = []
+    for n in _neighbors(start, width, size):
+        if mask[n]:
+            mask[n] = 0
+            frontier.append(n)
+
+    distance = 1
+    offsets = (-1, 1, -width, width)
+    while frontier and remaining:
+        next_frontier = []
+        for index in frontier:
+            if index in pending:
+                visit(index, distance)
+            for offset in offsets:
+                n = index + offset
+                if mask[n]:
+                    mask[n] = 0
+                    next_frontier.append(n)
+        frontier = next_frontier
+        distance += 1
+
+    return routes
+
+
+class ClusterGraph:
+    """Abstract graph over square clusters of a search mask, as in HPA*.
+
+    The grid is cut into `cluster_size` x `cluster_size` clusters. Every
+    walkable tile with a walkable neighbour in the next cluster is an
+    entrance, linked to that neighbour (one step) and to the other entrances
+    of its own cluster (walking distance inside the cluster). Textbook HPA*
+    keeps one entrance per border segment and returns near-optimal routes;
+    keeping every crossing makes the distances exact. Layouts with too many
+    crossings for that to pay off are flagged as not `worthwhile`.
+    """
+
+    def __init__(self, mask: bytearray, width: int, height: int, cluster_size: int = CLUSTER_SIZE) -> None:
+        self.mask = mask
+        self.width = width
+        self.height = height
+        self.cluster_size = cluster_size
+        # entrance tile index -> [(entrance tile index, distance)]
+        self.edges: dict[int, list[tuple[int, int]]] = {}
+        # cluster -> entrance tiles in it
+        entrances: dict[tuple[int, int], list[int]] = {}
+
+        def link(a: int, b: int) -> None:
+            for tile, other in ((a, b), (b, a)):
+                if tile not in self.edges:
+                    self.edges[tile] = []
+                    entrances.setdefault(self.cluster(tile), []).append(tile)
+                self.edges[tile].append((other, 1))
+
+        for x in range(cluster_size - 1, width - 1, cluster_size):
+            for index in range(width + x, width * height, width):
+                if mask[index] and mask[index + 1]:
+                    link(index, index + 1)
+        for y in range(cluster_size - 1, height - 1, cluster_size):
+            for index in range(y * width + 1, (y + 1) * width):
+                if mask[index] and mask[index + width]:
+                    link(index, index + width)
+
+        # building costs about (entrances per cluster)^2 and queries slow down
+        # with it; on open layouts with wide borders plain search is faster
+        self.worthwhile = sum(len(tiles) ** 2 for tiles in entrances.values()) <= 3 * mask.count(1)
+        if not self.worthwhile:
+            self.edges.clear()
+            return
+        for tiles in entrances.values():
+            for tile in tiles:
+                reach = self.local_distances(tile)
+                self.edges[tile].extend((other, reach[other]) for other in tiles if other != tile and other in reach)
+
+    def cluster(self, index: int) -> tuple[int, int]:
+        """(column, row) of the cluster containing tile `index`."""
+        return (index % self.width) // self.cluster_size, (index // self.width) // self.cluster_size
+
+    def local_distances(self, source: int) -> dict[int, int]:
+        """Walking distance from `source` to every tile reachable without leaving its cluster."""
+        width = self.width
+        mask = self.mask
+        column, row = self.cluster(source)
+        x0 = column * self.cluster_size
+        x1 = min(x0 + self.cluster_size, width) - 1
+        top = row * self.cluster_size * width
+        bottom = (min((row + 1) * self.cluster_size, self.height) - 1) * width
+
+        reach = {source: 0}
+        frontier = [source]
+        distance = 0
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for index in frontier:
+                x = index % width
+                for n in (
+                    index - 1 if x > x0 else -1,
+                    index + 1 if x < x1 else -1,
+                    index - width if index - width >= top else -1,
+                    index + width if index + width <= bottom + x1 else -1,
+                ):
+                    if n >= 0 and mask[n] and n not in reach:
+                        reach[n] = distance
+                        next_frontier.append(n)
+            frontier = next_frontier
+        return reach
+
+    def route(self, start: int, approach) -> tuple[int, list[int]]:
+        """Fewest steps from tile `start` to any tile in `approach`.
+
+        Returns the distance and every approach tile at that distance, or
+        (-1, []) when none can be reached. Runs A* over the entrances with
+        the Manhattan distance to the nearest approach tile as heuristic.
+        """
+        width = self.width
+        goals = {tile for tile in approach if self.mask[tile]}
+        if not goals:
+            return -1, []
+        goal_xy = [(tile % width, tile // width) for tile in goals]
+
+        if len(goal_xy) == 1:
+            (gx, gy), = goal_xy
+
+            def estimate(index: int) -> int:
+                return abs(index % width - gx) + abs(index // width - gy)
+        else:
+            def estimate(index: int) -> int:
+                x, y = index % width, index // width
+                return min(abs(x - gx) + abs(y - gy) for gx, gy in goal_xy)
+
+        # last leg: entrance -> [(approach tile, distance)] inside its cluster
+        arrivals: dict[int, list[tuple[int, int]]] = {}
+        for goal in goals:
+            for tile, distance in self.local_distances(goal).items():
+                if tile in self.edges:
+                    arrivals.setdefault(tile, []).append((goal, distance))
+
+        best: dict[int, int] = {}
+        heap: list[tuple[int, int, int]] = []
+        for tile, distance in self.local_distances(start).items():
+            if tile in self.edges or tile in goals:
+                best[tile] = distance
+                heap.append((distance + estimate(tile), distance, tile))
+        heapq.heapify(heap)
+
+        edges = self.edges
+        found = -1
+        reached: list[int] = []
+        while heap:
+            f, g, tile = heapq.heappop(heap)
+            if found >= 0 and f > found:
+                break
+            if g > best[tile]:
+                continue
+            if tile in goals:
+                if found < 0:
+                    found = g
+                reached.append(tile)
+                continue
+            for other, distance in edges.get(tile, ()) + arrivals.get(tile, []):
+                distance += g
+                if distance < best.get(other, distance + 1):
+                    best[other] = distance
+                    heapq.heappush(heap, (distance + estimate(other), distance, other))
+        return found, sorted(reached)
+
+
+_cluster_graphs: dict[tuple[int, bytes], ClusterGraph] = {}
+
+
+def cluster_graph(grid: List[List[Block]]) -> ClusterGraph:
+    """The ClusterGraph of `grid`, built on first use for each distinct layout."""
+    width = len(grid[0])
+    mask = search_mask(grid)
+    key = (width, bytes(mask))
+    graph = _cluster_graphs.get(key)
+    if graph is None:
+        if len(_cluster_graphs) >= 4:
+            del _cluster_graphs[next(iter(_cluster_graphs))]
+        graph = ClusterGraph(mask, width, len(grid))
+        _cluster_graphs[key] = graph
+    return graph
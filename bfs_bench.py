@@ -0,0 +1,264 @@
+"""Microbenchmark for the pathfinding kernel in bfs.py.
+
+Generates random perfect mazes, walks from the top-left corner to a
+dispenser in the bottom-right corner and times the flat-array
+`pathfind_neighbor_any` against the previous object-per-cell search (kept
+here as `pathfind_reference`). Both must return the same result.
+
+A second table checks the hierarchical search (`ClusterGraph`) against the
+flat one on random start/target pairs, optionally after opening a share of
+the maze walls, and reports its build time and mean query time. Any
+difference in distance or arrival tile is an error.
+
+`--check` skips the timings and only compares results: ClusterGraph
+against the flat search, and `pathfind_neighbor_any` as the game calls it
+(through the cluster graph on big maps) against `neighbor_routes`, on every
+size both as a perfect maze and with the `--open` share of walls removed.
+It exits with status 1 on the first mismatch.
+
+Usage:
+    python bfs_bench.py
+    python bfs_bench.py --sizes 50 200 --repeat 20
+    python bfs_bench.py --sizes 1000 --queries 50 --open 0.05
+    python bfs_bench.py --check --sizes 101 501 --queries 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import List
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from blocks import Block, Dispenser, Floor  # type: ignore
+from bfs import ClusterGraph, Position, _neighbors, neighbor_routes, pathfind_neighbor_any, search_mask
+from tilemap import FLOOR, WALL, TileMap
+
+
+@dataclass
+class _QueueEntry:
+    pos: Position
+    distance: int
+
+
+class _State(Enum):
+    NOT_FOUND = 0
+    CLOSED = 1
+    OPEN = 2
+    NOT_INTERACTABLE = 4
+
+
+def pathfind_reference(grid: List[List[Block]], playerStart: Position, toFind: Position) -> tuple[int, Position]:
+    """The search bfs.py used before the flat-array kernel, for comparison."""
+    if (
+        playerStart == toFind
+        or len(grid) <= 0
+        or len(grid[0]) <= 0
+        or toFind.x < 0
+        or toFind.y < 0
+        or toFind.x >= len(grid[0])
+        or toFind.y >= len(grid)
+    ):
+        return -1, Position(-1, -1)
+
+    queue: deque[_QueueEntry] = deque()
+    queue.appendleft(_QueueEntry(playerStart, 0))
+    m_grid = [
+        [_State.NOT_FOUND if isinstance(block, Floor) else _State.NOT_INTERACTABLE for block in row]
+        for row in grid
+    ]
+    while queue:
+        entry = queue.pop()
+        pos = entry.pos
+        for n in (
+            Position(pos.x - 1, pos.y),
+            Position(pos.x + 1, pos.y),
+            Position(pos.x, pos.y - 1),
+            Position(pos.x, pos.y + 1),
+        ):
+            if n == toFind:
+                return entry.distance, pos
+            if m_grid[n.y][n.x] == _State.NOT_FOUND and n.x > 0 and n.y > 0 and n.x < len(grid[0]) and n.y < len(grid):
+                queue.appendleft(_QueueEntry(n, entry.distance + 1))
+                m_grid[n.y][n.x] = _State.OPEN
+        m_grid[pos.y][pos.x] = _State.CLOSED
+    return -1, Position(-1, -1)
+
+
+def generate_maze(size: int, seed: int = 0) -> tuple[TileMap, Position, Position]:
+    """Perfect maze of about `size` x `size` tiles with a dispenser in the far corner.
+
+    Returns the map, the start tile and the dispenser position.
+    """
+    rng = random.Random(seed)
+    # cells sit on odd coordinates; walls in between are knocked out by a DFS
+    side = size if size % 2 == 1 else size + 1
+    tiles = bytearray([WALL]) * (side * side)
+    stack = [(1, 1)]
+    tiles[side + 1] = FLOOR
+    while stack:
+        x, y = stack[-1]
+        options = [
+            (x + dx, y + dy, dx, dy)
+            for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+            if 0 < x + dx < side - 1 and 0 < y + dy < side - 1 and tiles[(y + dy) * side + x + dx] == WALL
+        ]
+        if not options:
+            stack.pop()
+            continue
+        nx, ny, dx, dy = rng.choice(options)
+        tiles[(y + dy // 2) * side + x + dx // 2] = FLOOR
+        tiles[ny * side + nx] = FLOOR
+        stack.append((nx, ny))
+    grid = TileMap(side, side, tiles, {})
+    target = Position(side - 1, side - 2)
+    grid.set_object(target.x, target.y, Dispenser("1"))
+    return grid, Position(1, 1), target
+
+
+def open_walls(grid: TileMap, share: float, seed: int = 0) -> None:
+    """Turn about `share` of the inner walls of `grid` into floor."""
+    rng = random.Random(seed)
+    width = grid.width
+    for index, tile in enumerate(grid.tiles):
+        x, y = index % width, index // width
+        if tile == WALL and 0 < x < width - 1 and 0 < y < grid.height - 1 and rng.random() < share:
+            grid.tiles[index] = FLOOR
+
+
+def check_hierarchy(grid: TileMap, queries: int, seed: int = 0) -> tuple[float, float, float] | None:
+    """Compare ClusterGraph routes with the flat search on random pairs.
+
+    Returns (build seconds, mean hierarchical ms, mean flat ms), or None if
+    the graph is not worthwhile for this layout. Raises ValueError on the
+    first pair where the two disagree.
+    """
+    rng = random.Random(seed)
+    width = grid.width
+    size = width * grid.height
+    t0 = time.perf_counter()
+    graph = ClusterGraph(search_mask(grid), width, grid.height)
+    build = time.perf_counter() - t0
+    if not graph.worthwhile:
+        return None
+    floors = [index for index, tile in enumerate(grid.tiles) if tile == FLOOR]
+    hier_s = flat_s = 0.0
+    for _ in range(queries):
+        start = rng.choice(floors)
+        target = rng.randrange(size)
+        t0 = time.perf_counter()
+        distance, arrivals = graph.route(start, set(_neighbors(target, width, size)))
+        hier_s += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        expected = pathfind_neighbor_any(
+            grid, Position(start % width, start // width), Position(target % width, target // width), hierarchy=False
+        )
+        flat_s += time.perf_counter() - t0
+        arrival = expected[1].y * width + expected[1].x
+        if expected[0] == 0:
+            continue
+        if distance != expected[0] or (distance >= 0 and arrival not in arrivals):
+            raise ValueError(f"start {start}, target {target}: {distance} {arrivals} != {expected}")
+    return build, hier_s / queries * 1000, flat_s / queries * 1000
+
+
+def check_routes(grid: TileMap, queries: int, seed: int = 0) -> None:
+    """Compare `pathfind_neighbor_any` with `neighbor_routes` on random pairs.
+
+    This is the search `Game.find_route` uses, so on grids of
+    HIERARCHY_MIN_TILES or more it goes through the cluster graph. Raises
+    ValueError on the first pair where the two disagree.
+    """
+    rng = random.Random(seed)
+    width = grid.width
+    floors = [index for index, tile in enumerate(grid.tiles) if tile == FLOOR]
+    for _ in range(queries):
+        start = rng.choice(floors)
+        target = rng.randrange(width * grid.height)
+        start_pos = Position(start % width, start // width)
+        target_pos = Position(target % width, target // width)
+        found = pathfind_neighbor_any(grid, start_pos, target_pos)
+        key = (target_pos.x, target_pos.y)
+        expected = neighbor_routes(grid, start_pos, [key]).get(key, (-1, Position(-1, -1)))
+        if found != expected:
+            raise ValueError(f"start {start}, target {target}: {found} != {expected}")
+
+
+def check(args: argparse.Namespace) -> int:
+    """Result comparison of `--check`; 0 when every route matches."""
+    for size in args.sizes:
+        for share in sorted({0.0, args.open}):
+            grid, _, _ = generate_maze(size, args.seed)
+            open_walls(grid, share, args.seed)
+            try:
+                check_hierarchy(grid, args.queries, args.seed)
+                check_routes(grid, args.queries, args.seed)
+            except ValueError as e:
+                print(f"route mismatch on {size}x{size}, {share:.0%} open: {e}", file=sys.stderr)
+                return 1
+            print(f"{grid.width:>5}x{grid.height:<5} {share:>4.0%} open: {args.queries} pairs ok")
+    return 0
+
+
+def _time(fn, repeat: int) -> tuple[float, tuple[int, Position]]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the BFS kernel in bfs.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000], help="Maze side lengths")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per size (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=100, help="Random pairs checked against ClusterGraph per size")
+    parser.add_argument("--open", type=float, default=0.0, help="Share of inner walls removed for the ClusterGraph check")
+    parser.add_argument("--check", action="store_true", help="Only compare results, exit 1 on a mismatch")
+    args = parser.parse_args()
+
+    if args.check:
+        return check(args)
+
+    print(f"{'maze':>11} {'distance':>9} {'before ms':>10} {'after ms':>9} {'speedup':>8}")
+    for size in args.sizes:
+        grid, start, target = generate_maze(size, args.seed)
+        old_s, old = _time(lambda: pathfind_reference(grid, start, target), args.repeat)
+        new_s, new = _time(lambda: pathfind_neighbor_any(grid, start, target, hierarchy=False), args.repeat)
+        if old != new:
+            print(f"result mismatch on {size}x{size}: {old} != {new}", file=sys.stderr)
+            return 1
+        print(f"{grid.width:>5}x{grid.height:<5} {new[0]:>9} {old_s * 1000:>10.2f} {new_s * 1000:>9.2f} {old_s / new_s:>7.1f}x")
+
+    if args.queries <= 0:
+        return 0
+    print()
+    print(f"{'maze':>11} {'build s':>8} {'flat ms':>8} {'cluster ms':>11} {'speedup':>8}")
+    for size in args.sizes:
+        grid, _, _ = generate_maze(size, args.seed)
+        open_walls(grid, args.open, args.seed)
+        try:
+            result = check_hierarchy(grid, args.queries, args.seed)
+        except ValueError as e:
+            print(f"cluster route mismatch on {size}x{size}: {e}", file=sys.stderr)
+            return 1
+        if result is None:
+            print(f"{grid.width:>5}x{grid.height:<5} {'too many entrances, plain search is used':>30}")
+            continue
+        build, hier_ms, flat_ms = result
+        print(f"{grid.width:>5}x{grid.height:<5} {build:>8.2f} {flat_ms:>8.2f} {hier_ms:>11.2f} {flat_ms / hier_ms:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,6 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from typing import Tuple, List
-from collections import Counter
 from states import Operation  # type: ignore
 import re
 from game_utils import _load_appliance_colors, _load_asset
@@ -32,6 +31,10 @@ class Block(ABC):
 		walkable: bool -- whether agents can walk on this block
 	"""
 
+	# stateful subclasses declare their own __slots__; Wall and Floor are
+	# shared flyweights (see tilemap.py) and keep a regular __dict__
+	__slots__ = ()
+
 	graphics: Tuple[int, int, int] = (128, 128, 128)
 	char: str = "#"
 	walkable: bool = False
@@ -95,13 +98,14 @@ class Floor(Block):
 class Dispenser(Block):
 	"""Ingredient dispenser wall that shows a numeric id."""
 
+	__slots__ = ("id", "char", "img_name", "dispenser_time", "elapsed")
+
+	graphics = (160, 220, 160)
 	walkable = False
 
 	def __init__(self, id_char: str, disp_name: str =""):
 		self.id = id_char
-		self.graphics = (160, 220, 160)
 		self.char = id_char
-		self.walkable = False
 
 		disp_name=disp_name.strip().lower()
 		self.img_name = (re.sub(r'\s+', '_', disp_name))+".png"
@@ -227,26 +231,38 @@ class Dispenser(Block):
 		
 	def tick(self, time=1) -> None: #¯\_(ツ)_/¯
 		if self.dispenser_time != -1 and self.elapsed < self.dispenser_time:
-			self.elapsed+=time
+			self.elapsed = min(self.dispenser_time, self.elapsed + time)
+
+	def time_to_event(self) -> int | None:
+		"""Game steps until this dispenser expires, or None if it never will."""
+		if self.dispenser_time != -1 and self.elapsed < self.dispenser_time:
+			return self.dispenser_time - self.elapsed
+		return None
 
 
 class Appliance(Block):
 	"""Appliance wall that shows a letter id (A, B, C...)."""
 
+	__slots__ = (
+		"id", "repre_id_mod", "char", "contents", "operations", "recipes", "op_start_time",
+		"remaining_time", "active_operation", "img_name", "fill_color",
+	)
+
+	graphics = (160, 200, 240)
 	walkable = False
 
 	def __init__(self, id_char: str,appl_name: str =""):
 		self.id = id_char
 		self.repre_id_mod = chr(65 + (ord(self.id) - 65) % 5)
 		print(self.id, "->", self.repre_id_mod)
-		self.graphics = (160, 200, 240)
 		self.char = id_char
-		self.walkable = False
 		# appliance can hold multiple integer items
 		self.contents: list[int] = []
 
 		# operation handling
 		self.operations: List[Operation] = []
+		# sorted ingredient tuple -> operation, compiled as operations are added
+		self.recipes: dict[tuple[int, ...], Operation] = {}
 		# remaining blocked time in game steps (0 == not blocked)
 		self.op_start_time = None
 		self.remaining_time: int = 0
@@ -370,6 +386,8 @@ class Appliance(Block):
 	def add_operation(self, op: Operation) -> None:
 		"""Register an Operation that this appliance can perform."""
 		self.operations.append(op)
+		# the first registered operation wins for a given ingredient multiset
+		self.recipes.setdefault(tuple(sorted(op.ingredients)), op)
 		print(f"add operation {op.appliance}({op.ingredients}) -> {op.product} ({op.time})")
 
 	def is_blocked(self) -> bool:
@@ -377,8 +395,18 @@ class Appliance(Block):
 
 	def tick(self, progress_tracker) -> None:
 		"""Advance the appliance by one game step; decrement remaining_time."""
-		if self.remaining_time > 0:
-			self.remaining_time -= 1
+		self.advance(1, progress_tracker)
+
+	def advance(self, time: int, progress_tracker) -> None:
+		"""Advance the appliance by `time` game steps at once.
+
+		Equivalent to calling `tick` `time` times, but jumps straight from one
+		operation completion to the next instead of stepping one by one.
+		"""
+		while time > 0 and self.remaining_time > 0:
+			step = min(time, self.remaining_time)
+			time -= step
+			self.remaining_time -= step
 			# if we've finished an active operation, finalize it
 			if self.remaining_time == 0 and self.active_operation is not None:
 				# place the product into contents
@@ -391,6 +419,12 @@ class Appliance(Block):
 				self.op_start_time = None
 				self.try_start_operations(finish_time)
 
+	def time_to_event(self) -> int | None:
+		"""Game steps until the active operation finishes, or None when idle."""
+		if self.remaining_time > 0:
+			return self.remaining_time
+		return None
+
 	def try_start_operations(self, start_time) -> bool:
 		"""If the appliance inventory exactly matches any operation's ingredients,
 		start that operation: remove ingredients, set remaining_time, and place product.
@@ -399,29 +433,29 @@ class Appliance(Block):
 		if self.is_blocked():
 			return False
 
-		# compare multisets
-		contents_counter = Counter(self.contents)
-		for op in self.operations:
-			if Counter(op.ingredients) == contents_counter:
-				# start operation: remove ingredients and set active operation; product placed when finished
-				self.active_operation = op
-				self.remaining_time = op.time
-				self.op_start_time = start_time
-				# remove ingredients from visible contents
-				self.contents = []
-				print(f"appliance {self.id} started operation at time {start_time} -> will produce {op.product} in {op.time} steps")
-				return True
-		return False
+		# compare multisets via the canonical (sorted) form
+		op = self.recipes.get(tuple(sorted(self.contents)))
+		if op is None:
+			return False
+		# start operation: remove ingredients and set active operation; product placed when finished
+		self.active_operation = op
+		self.remaining_time = op.time
+		self.op_start_time = start_time
+		# remove ingredients from visible contents
+		self.contents = []
+		print(f"appliance {self.id} started operation at time {start_time} -> will produce {op.product} in {op.time} steps")
+		return True
 	
 
 class Table(Block):
 	"""A table"""
 
+	__slots__ = ("itemName", "itemId", "mapping")
+
 	walkable = False
 	char = "*"
 
 	def __init__(self,mapping):
-		self.walkable = False
 		# appliance can hold multiple integer items
 		self.itemName = None
 		self.itemId = None
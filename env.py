@@ -0,0 +1,291 @@
+"""Headless, in-process environment for the cookenv game.
+
+Wraps `Level`, `Game` and `Player` behind a small reset/step/observation
+API so levels can be played programmatically without pygame, `input()`
+or anything written to stdout.
+
+Example:
+    env = CookEnv("levels/level1")
+    obs = env.reset()
+    result = env.step("interact (3,1)")
+
+`TextSession` instead runs the whole text-mode game of `python -m game`
+in-process and returns its console output, for drivers that read the
+text (see benchmark.py).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import copy
+import io
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# game first: it silences the pygame banner before anything imports pygame
+from game import Game, level_prompt_steps, save_level_log  # type: ignore
+from blocks import Appliance, Dispenser, Table  # type: ignore
+from player import Player  # type: ignore
+from game_utils import list_levels_dir, quiet
+from states import CommandLog, GameState, Level
+
+
+@dataclass
+class StepResult:
+    """Outcome of a single `CookEnv.step` call.
+
+    Attributes:
+        game_time: int -- player game time after the command
+        inventory: int | None -- item id held by the player
+        progress: list[int] -- first time each item id was obtained (-1 if never)
+        done: bool -- True once the goal is reached or the level was left
+        outcome: str | None -- what the command did ("goal", "info", "exit", ...)
+    """
+
+    game_time: int
+    inventory: Optional[int]
+    progress: List[int]
+    done: bool
+    outcome: Optional[str] = None
+
+
+class CookEnv:
+    """Programmatic driver for a single level.
+
+    `step` accepts the same commands as the text mode (`interact (x,y)`,
+    `skip`, `drop`, `info`, `quit`) and returns a `StepResult`.
+    """
+
+    def __init__(self, level: Level | str | Path | None = None, use_pathfinding_control: bool = True) -> None:
+        self.level: Level | None = None
+        self.game: Game | None = None
+        self.player: Player | None = None
+        self.use_pathfinding_control = use_pathfinding_control
+        self.done = False
+        self.info_presses = 0
+        if level is not None:
+            self.level = self._as_level(level)
+
+    @staticmethod
+    def _as_level(level: Level | str | Path) -> Level:
+        if isinstance(level, Level):
+            return level
+        return Level.load_from_folder(level)
+
+    def reset(self, level: Level | str | Path | None = None) -> Dict[str, Any]:
+        """Start a fresh episode, optionally on a different level."""
+        if level is not None:
+            self.level = self._as_level(level)
+        if self.level is None:
+            raise RuntimeError("No level given; pass one to CookEnv() or reset()")
+        with quiet():
+            self.game = Game.from_level(self.level)
+        self.player = self.game.spawn_player()
+        self.done = False
+        self.info_presses = 0
+        return self.observation()
+
+    def step(self, command: str) -> StepResult:
+        """Execute one text command and return the resulting state."""
+        if self.game is None or self.player is None:
+            raise RuntimeError("Call reset() before step()")
+        if self.done:
+            raise RuntimeError("Episode is done; call reset() to start a new one")
+
+        cmd = command.strip().lower()
+        outcome = None
+        if cmd:
+            with quiet():
+                outcome = self.game.apply_command(self.player, cmd, self.use_pathfinding_control)
+        if outcome == "info":
+            self.info_presses += 1
+        elif outcome is not None:
+            # goal reached, or the level was quit/skipped
+            self.done = True
+
+        return StepResult(
+            game_time=self.player.game_time,
+            inventory=self.player.inventory,
+            progress=list(self.game.progress),
+            done=self.done,
+            outcome=outcome,
+        )
+
+    def snapshot(self) -> GameState:
+        """Capture the current episode state (see `Game.snapshot`)."""
+        if self.game is None or self.player is None:
+            raise RuntimeError("Call reset() before snapshot()")
+        return self.game.snapshot(self.player)
+
+    def restore(self, state: GameState) -> None:
+        """Return the episode to a state captured with `snapshot`."""
+        if self.game is None or self.player is None:
+            raise RuntimeError("Call reset() before restore()")
+        self.game.restore(state, self.player)
+        self.done = state.inventory is not None and state.inventory == self.game.goal
+
+    def clone(self) -> "CookEnv":
+        """Return an independent copy of this environment sharing the static level."""
+        if self.game is None or self.player is None:
+            raise RuntimeError("Call reset() before clone()")
+        new = CookEnv(self.level, self.use_pathfinding_control)
+        new.game = self.game.clone()
+        new.player = copy.copy(self.player)
+        new.done = self.done
+        new.info_presses = self.info_presses
+        return new
+
+    def observation(self) -> Dict[str, Any]:
+        """Return the current state as plain Python data."""
+        if self.game is None or self.player is None:
+            raise RuntimeError("Call reset() before observation()")
+        game = self.game
+        game.sync_blocks()
+        field = game.distance_field(self.player)
+
+        def distance(pos: tuple[int, int]) -> Optional[int]:
+            route = field.get(pos)
+            return None if route is None else route[0]
+
+        appliances = []
+        for x, y in game.appliance_positions:
+            blk: Appliance = game.grid[y][x]
+            op = blk.active_operation
+            appliances.append({
+                "id": blk.id,
+                "pos": (x, y),
+                "contents": list(blk.contents),
+                "operation": None if op is None else {"ingredients": list(op.ingredients), "product": op.product},
+                "remaining_time": blk.remaining_time,
+                "distance": distance((x, y)),
+            })
+        dispensers = []
+        for x, y in game.dispenser_positions:
+            blk: Dispenser = game.grid[y][x]
+            dispensers.append({
+                "id": blk.id,
+                "pos": (x, y),
+                "available": blk.dispense() != -1,
+                "remaining_time": None if blk.dispenser_time == -1 else blk.dispenser_time - blk.elapsed,
+                "distance": distance((x, y)),
+            })
+        tables = []
+        for x, y in game.table_positions:
+            blk: Table = game.grid[y][x]
+            tables.append({"pos": (x, y), "item": blk.itemId, "distance": distance((x, y))})
+
+        return {
+            "player": (self.player.x, self.player.y),
+            "orientation": self.player.orientation,
+            "game_time": self.player.game_time,
+            "inventory": self.player.inventory,
+            "progress": list(game.progress),
+            "goal": game.goal,
+            "done": self.done,
+            "appliances": appliances,
+            "dispensers": dispensers,
+            "tables": tables,
+        }
+
+
+class TextSession:
+    """The text-mode game of `python -m game <levels_dir>`, run in-process.
+
+    Plays the levels in order with pathfinding controls, like the text mode
+    of `play_levels`, but without stdin or a subprocess: `send` types one
+    line and `read` returns the console output since the last read, up to
+    and including the next input prompt. The output is the same text the
+    subprocess prints. Unlike `play_levels`, no score file is written. With
+    `record_dir`, a command log of every level played is written there, as
+    `python -m game --record` does; `close` saves the level in progress.
+    `show_distances` matches `--show-distances`.
+    """
+
+    def __init__(
+        self,
+        levels_dir: str = "levels",
+        use_pathfinding_control: bool = True,
+        record_dir: Optional[str] = None,
+        show_distances: bool = False,
+    ) -> None:
+        self.levels_dir = levels_dir
+        self.use_pathfinding_control = use_pathfinding_control
+        self.record_dir = record_dir
+        self.show_distances = show_distances
+        self.running = True
+        self._output = io.StringIO()
+        self._steps = self._play()
+        self._resume(None)
+
+    def _play(self):
+        """Level loop of `play_levels` in text mode, as a prompt generator."""
+        levels = list_levels_dir(self.levels_dir)
+        if not levels:
+            print(f"No levels found in '{self.levels_dir}'")
+            return
+        idx = 0
+        while idx < len(levels):
+            lvl_path = levels[idx]
+            lvl = Level.load_from_folder(lvl_path)
+            game = Game.from_level(lvl)
+            game.show_distances = self.show_distances
+            log = None
+            if self.record_dir is not None:
+                log = CommandLog(level=str(lvl.path), pathfinding=self.use_pathfinding_control)
+            try:
+                _, _, choice, _, _ = yield from game.text_steps(self.use_pathfinding_control, log=log)
+            finally:
+                if log is not None:
+                    save_level_log(log, self.record_dir, lvl.path)
+            if choice == "level_skip":
+                choice = yield from level_prompt_steps(levels)
+                if isinstance(choice, int):
+                    idx = choice
+                    continue
+            if choice == "repeat" or choice == "r":
+                print(f"Repeating level {lvl_path}")
+                continue
+            if choice == "continue" or choice == "c":
+                idx += 1
+                if idx >= len(levels):
+                    print("No more levels. Exiting.")
+                    print()
+                    break
+                print(f"Continuing to next level: {levels[idx]}")
+                continue
+            print("Exiting level play")
+            break
+
+    def _resume(self, line: Optional[str]) -> None:
+        with contextlib.redirect_stdout(self._output):
+            try:
+                prompt = next(self._steps) if line is None else self._steps.send(line)
+            except StopIteration:
+                self.running = False
+                return
+        # input() echoes its prompt to stdout
+        self._output.write(prompt)
+
+    def send(self, line: str) -> None:
+        """Answer the current prompt with `line` and run the game to the next one."""
+        if not self.running:
+            raise RuntimeError("The game has ended")
+        self._resume(line)
+
+    def read(self) -> Optional[str]:
+        """Output since the last read, or None if there is none."""
+        text = self._output.getvalue()
+        self._output.seek(0)
+        self._output.truncate()
+        return text or None
+
+    def step(self, line: str) -> Optional[str]:
+        """`send` followed by `read`."""
+        self.send(line)
+        return self.read()
+
+    def close(self) -> None:
+        """Stop the game; later `send` calls raise RuntimeError."""
+        self._steps.close()
+        self.running = False
@@ -18,7 +18,7 @@ warnings.filterwarnings(
 	module='pygame' # Target the warning from the pygame module
 )
 
-from typing import List, Sequence
+from typing import Iterator, List, Sequence
 
 try:
 	import pygame
@@ -31,11 +31,14 @@ except Exception:
 
 from blocks import Block, Wall, Floor, Dispenser, Appliance, Table, _load_appliance_colors  # type: ignore
 from player import Player  # type: ignore
-from states import Level
+from states import Level, GameState, CommandLog
 from pathlib import Path
 from datetime import datetime
 import asyncio
-from bfs  import pathfind_neighbor_any, Position
+import copy
+import heapq
+from bfs  import pathfind_neighbor_any, neighbor_routes, iter_path, Position, HIERARCHY_MIN_TILES
+from tilemap import TileMap, compile_tiles
 import sys
 import time
 import re
@@ -47,7 +50,23 @@ if sys.platform == "emscripten":
 
 DEBUG = False
 
+# movement commands of the non-pathfinding controls: orientation, dx, dy
+_MOVES = {
+	"up": ("up", 0, -1),
+	"down": ("down", 0, 1),
+	"left": ("left", -1, 0),
+	"right": ("right", 1, 0),
+}
+
+# pathfinding-control command: walk next to a block and interact with it
+INTERACT_RE = re.compile(r"interact\s*\(\s*(-?\d+)\s*,\s*(-?\d+)\s*\)")
+
 def level_prompt_txt(levels : list[str]) -> int:
+	return run_with_input(level_prompt_steps(levels))
+
+
+def level_prompt_steps(levels : list[str]):
+	"""Generator form of `level_prompt_txt`: yields the prompt, receives the typed line."""
 
 	while True:
 		print("Available levels: ")
@@ -56,7 +75,7 @@ def level_prompt_txt(levels : list[str]) -> int:
 			print(i, end=" ")
 		print()
 
-		cmd = input(" > ").strip().lower()
+		cmd = (yield " > ").strip().lower()
 		if (cmd == "quit" or cmd == "continue" or cmd == "repeat" or
 		   cmd == "q" or cmd == "c" or cmd == "r"):
 			return cmd
@@ -72,16 +91,87 @@ def level_prompt_txt(levels : list[str]) -> int:
 		return choice
 
 
+def level_info_text(lvl: Level) -> str:
+	"""Description and mapping of a level, as the `info` command prints them."""
+	lines = ["", "--- Description ---"]
+	lines.extend((lvl.desc or "").splitlines())
+	lines.extend(["", "--- Mapping ---"])
+	# separate items and appliances
+	items = []
+	agg = []
+	for k, v in (lvl.mapping or {}).items():
+		if k.isdigit():
+			items.append((k, v))
+		else:
+			agg.append((k, v))
+	if items:
+		lines.append("Items:")
+		for k, v in items:
+			lines.append(f"  - {k}: {v}")
+	if agg:
+		lines.append("Appliances:")
+		for k, v in agg:
+			lines.append(f"  - {k}: {v}")
+	return "\n".join(lines) + "\n"
+
+
+def run_with_input(steps):
+	"""Drive a prompt generator (see `Game.text_steps`) from stdin.
+
+	Every prompt the generator yields is shown by `input`, the typed line
+	is sent back, and the generator's return value is returned.
+	"""
+	try:
+		prompt = next(steps)
+		while True:
+			prompt = steps.send(input(prompt))
+	except StopIteration as stop:
+		return stop.value
+
+
+
+def reference_score(level: Level, game_time: int | None) -> float | None:
+	"""Optimal / achieved game time for a run of `level`, or None if unknown.
+
+	The optimum comes from the solver cache only, since solving can take
+	long; fill it with `python solver.py` or by running the benchmark.
+	"""
+	# imported here: solver imports this module
+	from solver import load_cached, normalized_score
+	try:
+		result = load_cached(level)
+	except OSError:
+		return None
+	if result is None or result.optimal_time is None:
+		return None
+	return normalized_score(result.optimal_time, game_time)
+
+
+def save_level_log(log: CommandLog, record_dir: str, lvl_path: str) -> Path:
+	"""Write the command log of one played level into `record_dir`.
+
+	Files are named after the level folder plus a timestamp, so replaying a
+	level several times keeps every log.
+	"""
+	Path(record_dir).mkdir(parents=True, exist_ok=True)
+	path = Path(record_dir) / f"{Path(lvl_path).name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.log"
+	log.save(path)
+	return path
+
 
-async def play_levels(start_folder: str | None = None, use_text: bool = True, pathfinding_controls: bool = True) -> None:
+async def play_levels(start_folder: str | None = None, use_text: bool = True, pathfinding_controls: bool = True, record_dir: str | None = None, show_distances: bool = False, levels_dir: str = "levels") -> None:
 	"""Play all levels starting from the lowest available.
 
 	If start_folder is provided and present in the levels list it will be used
 	as the first level; otherwise we start from the first sorted level.
+	If record_dir is provided, a command log (see replay.py) is written there
+	for every level played. With show_distances, the text board also lists
+	the walking distance to every interactable. Levels come from the folder
+	or level pack `levels_dir`.
 	"""
-	levels = list_levels_dir()
+	levels = list_levels_dir(levels_dir)
 	if not levels:
-		print("No levels found in 'levels/'")
+		print(f"No levels found in '{levels_dir}'")
 		return
 
 	# find starting index
@@ -109,12 +199,22 @@ async def play_levels(start_folder: str | None = None, use_text: bool = True, pa
 		#print(f"Loading level: {lvl_path}")
 		lvl = Level.load_from_folder(lvl_path)
 		game = Game.from_level(lvl)
+		game.show_distances = show_distances
+
+		log = None
+		if record_dir is not None:
+			log = CommandLog(level=str(lvl.path), pathfinding=pathfinding_controls if use_text else False)
 
 		t0 = time.time()
-		if use_text:
-			completed, game_time, choice, info_presses, progress = game.run_text(pathfinding_controls)
-		else:
-			completed, game_time, choice, info_presses, progress = await game.run_pygame()
+		try:
+			if use_text:
+				completed, game_time, choice, info_presses, progress = game.run_text(pathfinding_controls, log=log)
+			else:
+				completed, game_time, choice, info_presses, progress = await game.run_pygame(log=log)
+		finally:
+			# a level cut short (end of input, Ctrl+C) still gets its log
+			if log is not None and sys.platform != "emscripten":
+				save_level_log(log, record_dir, lvl.path)
 		time_spent = time.time() - t0
 
 		if completed != -1: #skip
@@ -124,8 +224,9 @@ async def play_levels(start_folder: str | None = None, use_text: bool = True, pa
 				)
 				await asyncio.sleep(0)
 			else:
+				score = reference_score(lvl, game_time if completed else None)
 				with open(score_file, "a+") as f:
-					f.write(f"{username}, {lvl.path}, {game_time if completed else -1}, {info_presses}, {time_spent}, {progress}")
+					f.write(f"{username}, {lvl.path}, {game_time if completed else -1}, {info_presses}, {time_spent}, {progress}, {-1 if score is None else round(score, 3)}")
 				 
 		# interpret choice
 		if choice == "level_skip":
@@ -156,25 +257,68 @@ async def play_levels(start_folder: str | None = None, use_text: bool = True, pa
 		break
 	if not use_text:
 		ui.show_html(generate_end_html("https://docs.google.com/forms/d/e/1FAIpQLSeKPSA57O5TPji9npJsVBbHbODVpX5AX440SCUmS3NkRAXXXQ/viewform?usp=dialog"))
+class LayoutRoutes:
+	"""Route caches of one map layout, shared by every Game built on it.
+
+	Routes only depend on where walls, floor and blocks are, so resetting
+	or rebuilding a level reuses what earlier games on it already found.
+	"""
+
+	__slots__ = ("rows", "pairs", "paths", "distance_table")
+
+	def __init__(self) -> None:
+		self.rows: dict[tuple[int, int], dict[tuple[int, int], tuple[int, Position]]] = {}
+		self.pairs: dict[tuple[int, int, int, int], tuple[int, Position]] = {}
+		self.paths: dict[tuple[int, int, int, int], tuple[tuple[int, int], ...]] = {}
+		self.distance_table: dict[tuple[tuple[int, int], tuple[int, int]], int] | None = None
+
+
+_layout_routes: dict[tuple[int, bytes], LayoutRoutes] = {}
+
+
+def layout_routes(grid: TileMap) -> LayoutRoutes:
+	"""The route caches of `grid`, created on first use for each distinct layout."""
+	key = (grid.width, bytes(grid.tiles))
+	routes = _layout_routes.get(key)
+	if routes is None:
+		if len(_layout_routes) >= 16:
+			del _layout_routes[next(iter(_layout_routes))]
+		routes = LayoutRoutes()
+		_layout_routes[key] = routes
+	return routes
+
+
 class Game:
 	"""Container for a grid of Block instances.
 
-	The grid is a list of rows (y-major): grid[y][x].
+	The grid is indexed y-major: grid[y][x]. It is stored as a TileMap
+	(one byte per static tile plus a sparse table of stateful blocks); a
+	list of rows of Blocks is accepted and converted.
 	"""
 
 	def __init__(
 		self,
-		grid: List[List[Block]],
+		grid: TileMap | List[List[Block]],
 		operations: list | None = None,
 		goal: int | None = None,
 		object_mapping: dict[str, object] = None
 	) -> None:
-		assert grid and all(isinstance(r, list) for r in grid), "grid must be a 2D list"
-		# ensure rectangular
-		widths = {len(r) for r in grid}
-		if len(widths) != 1:
-			raise ValueError("All rows in grid must have the same length")
+		if not isinstance(grid, TileMap):
+			grid = TileMap.from_blocks(grid)
 		self.grid = grid
+		# index interactable blocks once; the map layout never changes
+		self._index_blocks()
+		# walls never move, so routes stay valid for the whole game and are
+		# shared with every other game on the same layout
+		self._layout = layout_routes(grid)
+		# standing tile -> {interactable: (distance, arrival tile)} (see precompute_routes)
+		self._routes = self._layout.rows
+		# (start, target) -> route, for maps big enough to be routed through a
+		# cluster graph one target at a time (see find_route)
+		self._pairs = self._layout.pairs
+		self._hierarchical = grid.width * grid.height >= HIERARCHY_MIN_TILES
+		# (start, target) -> tiles walked, filled by iter_route
+		self._paths = self._layout.paths
 		# distribute operations to appliances when provided
 		self.operations = operations or []
 		if self.operations:
@@ -189,6 +333,16 @@ class Game:
 		# optional Level object (set by from_level)
 		self.level: Level | None = None
 		self.object_mapping=object_mapping
+		# also list walking distances to all interactables in the text board
+		self.show_distances = False
+		# event-driven clock: only blocks with a pending timer (running appliance,
+		# counting dispenser) are queued, keyed by the clock value they fire at
+		self.clock = 0
+		self._timeline: list[tuple[int, int, int, int]] = []
+		# (x, y) -> (clock the block was last advanced to, clock its event fires at)
+		self._pending: dict[tuple[int, int], tuple[int, int]] = {}
+		for x, y in self.dispenser_positions:
+			self._schedule_block(x, y)
 
 
 	@classmethod
@@ -212,40 +366,159 @@ class Game:
 		goal = level_obj.goal
 		mapping=level_obj.mapping
 
-		game = cls.from_text_map(lines, goal, mapping=mapping, operations=ops)
+		game = cls.from_text_map(lines, goal, mapping=mapping, operations=ops, compiled=level_obj.compiled)
 		if level_obj.start_pos is not None:
 			game.start_pos = level_obj.start_pos
 			game.start_orientation = level_obj.start_orientation
+		if not game._hierarchical:
+			# big maps fill their routes on demand instead (see find_route)
+			game.precompute_routes()
 		# attach the original Level object if available
 		if hasattr(level_obj, "path"):
 			game.level = level_obj
 		return game
 
+	def _index_blocks(self) -> None:
+		"""Record the coordinates of all interactable blocks (row-major order).
+
+		Appliances, dispensers and tables are the only stateful tiles, so every
+		per-step pass over the level iterates these lists instead of the grid.
+		"""
+		self.appliance_positions: list[tuple[int, int]] = []
+		self.dispenser_positions: list[tuple[int, int]] = []
+		self.table_positions: list[tuple[int, int]] = []
+		# appliance id -> appliances with that id (a letter may appear more than once)
+		self.appliances_by_id: dict[str, list[Appliance]] = {}
+		for x, y in sorted(self.grid.objects, key=lambda pos: (pos[1], pos[0])):
+			block = self.grid.objects[(x, y)]
+			if isinstance(block, Appliance):
+				self.appliance_positions.append((x, y))
+				self.appliances_by_id.setdefault(block.id, []).append(block)
+			elif isinstance(block, Dispenser):
+				self.dispenser_positions.append((x, y))
+			elif isinstance(block, Table):
+				self.table_positions.append((x, y))
+
+	def precompute_routes(self) -> None:
+		"""Fill the route table for every tile the player can act from.
+
+		Those are the walkable neighbours of all interactables plus the start
+		tile; one search per tile covers every target at once, after which
+		`find_route` is a dictionary lookup. Rows are shared per layout, so
+		this only searches on the first game of a level.
+		"""
+		sources = set()
+		if self.start_pos is not None:
+			sources.add(tuple(self.start_pos))
+		for x, y in self.grid.objects:
+			for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+				if 0 <= ny < len(self.grid) and 0 <= nx < len(self.grid[0]) and self.grid[ny][nx].walkable:
+					sources.add((nx, ny))
+		for source in sorted(sources, key=lambda pos: (pos[1], pos[0])):
+			self.routes_from(source)
+
+	def routes_from(self, start: tuple[int, int]) -> dict[tuple[int, int], tuple[int, Position]]:
+		"""Routes from `start` to every reachable interactable.
+
+		Maps (x, y) of each interactable to (distance, arrival position), the
+		same pair `pathfind_neighbor_any` returns. Unreachable blocks are left
+		out. Rows are computed on first use and kept.
+		"""
+		row = self._routes.get(start)
+		if row is None:
+			row = neighbor_routes(self.grid, Position(*start), self.grid.objects)
+			self._routes[start] = row
+		return row
+
+	def distance_field(self, player: Player) -> dict[tuple[int, int], tuple[int, Position]]:
+		"""Distance and approach tile from `player` to every reachable interactable.
+
+		One search covers all blocks; the result is kept per tile, so it is
+		only recomputed when the player stands somewhere new.
+		"""
+		return self.routes_from((player.x, player.y))
+
+	def find_route(self, start: tuple[int, int], target: tuple[int, int]) -> tuple[int, Position]:
+		"""Shortest walk from `start` to a tile next to `target`.
+
+		Returns (distance, arrival position) like `pathfind_neighbor_any`, or
+		(-1, Position(-1, -1)) when there is no way there. On maps of
+		HIERARCHY_MIN_TILES or more, a tile without a route table row asks
+		the cluster graph for this one target instead of searching the whole
+		map for all of them.
+		"""
+		if target in self.grid.objects:
+			if self._hierarchical and start not in self._routes:
+				key = start + target
+				route = self._pairs.get(key)
+				if route is None:
+					route = pathfind_neighbor_any(self.grid, Position(*start), Position(*target))
+					self._pairs[key] = route
+				return route
+			route = self.routes_from(start).get(target)
+			return route if route is not None else (-1, Position(-1, -1))
+		return pathfind_neighbor_any(self.grid, Position(*start), Position(*target))
+
+	def iter_route(self, start: tuple[int, int], target: tuple[int, int]) -> Iterator[tuple[int, int]]:
+		"""Tiles walked, one per step, on the route `find_route` takes.
+
+		Ends on the arrival tile; yields nothing when no walking is needed or
+		there is no route. Paths are reconstructed once per (start, target)
+		and replayed from memory afterwards.
+		"""
+		key = start + target
+		path = self._paths.get(key)
+		if path is None:
+			path = tuple((pos.x, pos.y) for pos in iter_path(self.grid, Position(*start), Position(*target)))
+			self._paths[key] = path
+		return iter(path)
+
+	def distance_table(self) -> dict[tuple[tuple[int, int], tuple[int, int]], int]:
+		"""Walking distance between every pair of interactables.
+
+		Maps (source, target) block positions to the fewest steps from
+		standing next to the source to standing next to the target (0 for
+		the same block); pairs with no connecting walk are left out.
+		"""
+		if self._layout.distance_table is None:
+			table = {}
+			for src in self.grid.objects:
+				table[(src, src)] = 0
+				x, y = src
+				for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+					if not (0 <= ny < len(self.grid) and 0 <= nx < len(self.grid[0]) and self.grid[ny][nx].walkable):
+						continue
+					for dst, (dist, _) in self.routes_from((nx, ny)).items():
+						if dist < table.get((src, dst), dist + 1):
+							table[(src, dst)] = dist
+			self._layout.distance_table = table
+		return self._layout.distance_table
+
 	def distribute_operations(self) -> None:
 		"""Assign operations to appliances based on the operation.appliance id."""
 		# operations is a list of Operation-like objects; import locally to avoid cycles
-		for y, row in enumerate(self.grid):
-			for x, block in enumerate(row):
-				if isinstance(block, Appliance):
-					# find ops for this appliance id
-					for op in self.operations:
-						try:
-							if getattr(op, "appliance", None) == block.id:
-								block.add_operation(op)
-						except Exception:
-							pass
-				elif isinstance(block, Dispenser):
-					for op in self.operations:
-						try:
-							dispAttr= getattr(op, "dispenser", None)
-							if ( dispAttr != None and isinstance(dispAttr,int) and block.id.isdigit() 
-		   						and int(block.id) == dispAttr):
-
-								expTime= getattr(op, "expTime", None)
-								if expTime != None:
-									block.setExpirationTime(expTime)
-						except Exception:
-							pass #TODO:
+		for x, y in self.appliance_positions:
+			block = self.grid[y][x]
+			# find ops for this appliance id
+			for op in self.operations:
+				try:
+					if getattr(op, "appliance", None) == block.id:
+						block.add_operation(op)
+				except Exception:
+					pass
+		for x, y in self.dispenser_positions:
+			block = self.grid[y][x]
+			for op in self.operations:
+				try:
+					dispAttr= getattr(op, "dispenser", None)
+					if ( dispAttr != None and isinstance(dispAttr,int) and block.id.isdigit() 
+						and int(block.id) == dispAttr):
+
+						expTime= getattr(op, "expTime", None)
+						if expTime != None:
+							block.setExpirationTime(expTime)
+				except Exception:
+					pass #TODO:
 
 	@classmethod
 	def from_text_map(
@@ -254,53 +527,35 @@ class Game:
 		goal: int,
 		mapping: dict[str, object] | None = None,
 		operations: list | None = None,
+		compiled: tuple[int, bytes, tuple[tuple[int, int, str], ...]] | None = None,
 	) -> "Game":
 		"""Construct a Game from an iterable of strings.
 
-		Each character is mapped to a Block subclass via `mapping`.
-		By default, '#' -> Wall, '.' -> Floor, ' ' -> Floor.
+		'#' -> Wall, '.' -> Floor, ' ' -> Floor; digits, letters and '*'
+		become Dispenser, Appliance and Table objects, named via `mapping`.
+		`compiled` is the result of `compile_tiles(lines)` when the caller
+		already has it (see `Level.compiled`).
 		"""
 
-		#:)))))))))
 		object_mapping=mapping
-		mapping = {"#": Wall, ".": Floor, " ": Floor}
-
-
-		
-
-		grid: List[List[Block]] = []
-		for line in lines:
-			row: List[Block] = []
-			for ch in line.rstrip("\n"):
-				spec = mapping.get(ch)
-				if spec is None:
-					# fallback: digits -> Dispenser, letters -> Appliance
-					if ch.isdigit():
-						name=object_mapping.get(ch)
-						if(name is None):
-							obj = Dispenser(ch)
-						else:
-							obj = Dispenser(ch,name)
-					elif ch.isalpha():
-						name=object_mapping.get(ch)
-						if(name is None):
-							obj = Appliance(ch)
-						else:
-							obj = Appliance(ch,name)
-					elif ch == "*":
-						obj = Table(object_mapping)
-					else:
-						raise ValueError(f"Unrecognized map character: {ch!r}")
 
-					row.append(obj)
-
-				elif isinstance(spec, type) and issubclass(spec, Block):
-					# Block subclass
-					row.append(spec())
-				else:
-					raise ValueError(f"Invalid mapping for character {ch!r}")
-			grid.append(row)
+		# static tiles are stored as bytes; only stateful blocks become objects
+		if compiled is None:
+			compiled = compile_tiles(lines)
+		width, codes, spots = compiled
+		tiles = bytearray(codes)
+		objects: dict[tuple[int, int], Block] = {}
+		for x, y, ch in spots:
+			name = object_mapping.get(ch)
+			if ch.isdigit():
+				obj = Dispenser(ch) if name is None else Dispenser(ch, name)
+			elif ch.isalpha():
+				obj = Appliance(ch) if name is None else Appliance(ch, name)
+			else:
+				obj = Table(object_mapping)
+			objects[(x, y)] = obj
 
+		grid = TileMap(width, len(lines), tiles, objects)
 		return cls(grid, operations, goal,object_mapping)
 
 	def draw(self, player: "Player" | None = None) -> str: #TODO:?
@@ -432,9 +687,13 @@ class Game:
 		scale_to_display: bool = True,
 		margin: float = 0.95,
 		min_tile_size: int = 16,
+		log: CommandLog | None = None,
 	):
 		"""Open a pygame window and render the grid. Blocks' draw methods
 		are used to render each tile.
+
+		If `log` is given, every applied key press is recorded in it as the
+		equivalent text command together with the resulting state hash.
 		"""
 		if not _PYGAME_AVAILABLE:
 			raise RuntimeError("pygame is not available in this environment")
@@ -477,32 +736,8 @@ class Game:
 		screen = pygame.display.set_mode((width, height))
 		pygame.display.set_caption(caption)
 
-		# Create a player in the first available walkable tile (top-left search)
-		player = None
-		# if a start_pos was provided use it
-		if getattr(self, "start_pos", None) is not None:
-			x, y = self.start_pos
-			if (
-				0 <= y < len(self.grid)
-				and 0 <= x < len(self.grid[0])
-				and self.grid[y][x].walkable
-			):
-				player = Player(x, y)
-				# set starting orientation if provided
-				if getattr(self, "start_orientation", None) is not None:
-					player.orientation = self.start_orientation
-		# otherwise fall back to first walkable tile
-		if player is None:
-			for y, row in enumerate(self.grid):
-				for x, block in enumerate(row):
-					if block.walkable:
-						player = Player(x, y)
-						break
-				if player is not None:
-					break
-
-		if player is None:
-			raise RuntimeError("No walkable tile found to place the player")
+		# Create a player at the start marker (or the first walkable tile)
+		player = self.spawn_player()
 
 		running = True
 		clock = pygame.time.Clock()
@@ -541,6 +776,8 @@ class Game:
 					
 
 					if event.key == pygame.K_e:
+						if log is not None:
+							log.record("info", self.snapshot(player))
 						click_time = time.time()
 						displayed_time = click_time - display_start
 						if show_info == 1:
@@ -560,74 +797,44 @@ class Game:
 						continue
 					else:
 						ui.hide()
-					# map keys to orientation and movement deltas, then delegate to Player
-					dx = dy = 0
-					new_orientation = player.orientation
+					# map keys to the text-mode movement commands, so a recorded
+					# session replays through apply_command
+					cmd = None
 					if event.key in (pygame.K_w, pygame.K_UP):
-						new_orientation = "up"
-						dy = -1
+						cmd = "up"
 					elif event.key in (pygame.K_s, pygame.K_DOWN):
-						new_orientation = "down"
-						dy = 1
+						cmd = "down"
 					elif event.key in (pygame.K_a, pygame.K_LEFT):
-						new_orientation = "left"
-						dx = -1
+						cmd = "left"
 					elif event.key in (pygame.K_d, pygame.K_RIGHT):
-						new_orientation = "right"
-						dx = 1
-
-					# update orientation (even if movement blocked)
-					player.set_orientation(new_orientation)
-
-					# attempt move via player's try_move
-					if dx != 0 or dy != 0:
-						moved = player.try_move(dx, dy, self.grid)
-						if moved:
-							# advance appliances by one game step and try to start ops
-							for ry, rrow in enumerate(self.grid):
-								for rx, blk in enumerate(rrow):
-									if isinstance(blk, Appliance):
-										blk.tick(self.progress)
-										# after ticking, attempt to start any eligible op
-										blk.try_start_operations(player.game_time)
-									elif isinstance(blk, Dispenser):
-										blk.tick()
-
+						cmd = "right"
 					elif event.key == pygame.K_SPACE:
 						# interact with the tile in front
-						player.interact(self.grid)
-
-						# mark item time if not yet found
-						if player.inventory is not None and self.progress[player.inventory-1] == -1:
-							self.progress[player.inventory-1] = player.game_time
-
+						cmd = "interact"
 
-						# check goal achievement
-						if self.goal is not None and player.inventory == self.goal:
-							print(
-								f"Goal achieved: player has item {self.goal} at time {player.game_time}"
-							)
+					if cmd is not None:
+						outcome = self.apply_command(player, cmd, use_pathfinding_control=False)
+						if outcome == "goal":
 							level_completed = True
 							running = False
 					elif event.key == pygame.K_q:
 						# pass time without moving
 						player.pass_time()
 						# tick appliances same as on move
-						for ry, rrow in enumerate(self.grid):
-							for rx, blk in enumerate(rrow):
-								if isinstance(blk, Appliance):
-									blk.tick(self.progress)
-									blk.try_start_operations(player.game_time)
-								elif isinstance(blk, Dispenser):
-									blk.tick()
+						self.tick_blocks(1)
+						cmd = "skip"
 					elif event.key == pygame.K_r:
 						player.inventory = None
+						cmd = "drop"
+					if cmd is not None and log is not None:
+						log.record(cmd, self.snapshot(player))
 
 			# draw background (optional)
 			# fill background for tiles area
 			screen.fill((100, 100, 100))
 
 			# draw tiles
+			self.sync_blocks()
 			for y, row in enumerate(self.grid):
 				for x, block in enumerate(row):
 					block.draw(screen, x, y, tile_size)
@@ -763,6 +970,7 @@ class Game:
 			return 1, player.game_time, None, (info_press_counter, game_info_display_time, level_info_display_time), self.progress
 
 	def __print_board(self,player : Player):
+		self.sync_blocks()
 		print(self.draw(player))
 		print(f"Time: {player.game_time}")
 		print(
@@ -770,36 +978,41 @@ class Game:
 		)
 		# appliances status
 		print("Appliances:")
-		for yy, row in enumerate(self.grid):
-			for xx, blk in enumerate(row):
-				if isinstance(blk, Appliance):
-					status = "idle"
-					if blk.active_operation is not None:
-						op = blk.active_operation
-						status = f"running {op.ingredients} -> {op.product}, remaining={blk.remaining_time}"
-					print(
-						f"  {blk.id} at ({xx},{yy}): {status}; contents={blk.contents}"
-					)
+		for xx, yy in self.appliance_positions:
+			blk = self.grid[yy][xx]
+			status = "idle"
+			if blk.active_operation is not None:
+				op = blk.active_operation
+				status = f"running {op.ingredients} -> {op.product}, remaining={blk.remaining_time}"
+			print(
+				f"  {blk.id} at ({xx},{yy}): {status}; contents={blk.contents}"
+			)
 		print("Dispensers:")
-		for yy, row in enumerate(self.grid):
-			for xx, blk in enumerate(row):
-				if isinstance(blk, Dispenser):
-					status = "available"
-					if (blk.dispenser_time!=-1 and blk.elapsed < blk.dispenser_time):
-						print(f"  {blk.id} at ({xx},{yy}): {status}; remaining time: {blk.dispenser_time - blk.elapsed}")
-					elif (blk.dispenser_time == -1):
-						print(f"  {blk.id} at ({xx},{yy}): {status};")
-					else:
-						status="unavailable"
-						print(f"  {blk.id} at ({xx},{yy}): {status};")
+		for xx, yy in self.dispenser_positions:
+			blk = self.grid[yy][xx]
+			status = "available"
+			if (blk.dispenser_time!=-1 and blk.elapsed < blk.dispenser_time):
+				print(f"  {blk.id} at ({xx},{yy}): {status}; remaining time: {blk.dispenser_time - blk.elapsed}")
+			elif (blk.dispenser_time == -1):
+				print(f"  {blk.id} at ({xx},{yy}): {status};")
+			else:
+				status="unavailable"
+				print(f"  {blk.id} at ({xx},{yy}): {status};")
+		if self.show_distances:
+			field = self.distance_field(player)
+			print("Distances:")
+			for xx, yy in self.appliance_positions + self.dispenser_positions + self.table_positions:
+				blk = self.grid[yy][xx]
+				name = getattr(blk, "id", "Table")
+				route = field.get((xx, yy))
+				print(f"  {name} at ({xx},{yy}): {'unreachable' if route is None else route[0]}")
 		# print("Tables:")
-		# for yy, row in enumerate(self.grid):
-		# 	for xx, blk in enumerate(row):
-		# 		if isinstance(blk, Table):
-		# 			if blk.has_item():
-		# 				print(f" Table at ({xx},{yy}): {blk.itemId}")
-		# 			else:
-		# 				print(f" Table at ({xx},{yy}): EMPTY")
+		# for xx, yy in self.table_positions:
+		# 	blk = self.grid[yy][xx]
+		# 	if blk.has_item():
+		# 		print(f" Table at ({xx},{yy}): {blk.itemId}")
+		# 	else:
+		# 		print(f" Table at ({xx},{yy}): EMPTY")
 		
 
 
@@ -808,57 +1021,135 @@ class Game:
 		if lvl is None:
 			print("No level info available")
 			return
-		print("\n--- Description ---")
-		for raw in (lvl.desc or "").splitlines():
-			print(raw)
-		print("\n--- Mapping ---")
-		# separate items and appliances
-		items = []
-		agg = []
-		for k, v in (lvl.mapping or {}).items():
-			if k.isdigit():
-				items.append((k, v))
-			else:
-				agg.append((k, v))
-		if items:
-			print("Items:")
-			for k, v in items:
-				print(f"  - {k}: {v}")
-		if agg:
-			print("Appliances:")
-			for k, v in agg:
-				print(f"  - {k}: {v}")
+		print(level_info_text(lvl), end="")
 
 	def tick_blocks(self, time):
-		for ry, rrow in enumerate(self.grid):
-			for rx, blk in enumerate(rrow):
-				for a in range(time):
-					if isinstance(blk, Appliance):
-						blk.tick(self.progress)
-					elif isinstance(blk, Dispenser):
-						blk.tick()
-				
-	def run_text(self, use_pathfinding_control: bool = True, auto_continue = True):
-		"""Run a simple text-mode loop.
-
-		Commands in normal mode:
-		- up, down, left, right : attempt to move in that direction (orientation sets first)
-		- interact : interact with the tile in front (pick/place)
-		Commands in pathfinfing mode:
-		- interact (x,y) : pathfind to the block at (x,y) and attempt to interact with it (pick/place)
-		Universal commands:
-		- info : print level description and mapping
-		- quit : exit
-		- skip : skip time
-		- drop : empty inventory
+		"""Advance the clock of all blocks by `time` game steps.
 
-		Movement steps advance game time and tick appliances; other commands do not advance time.
+		Only blocks whose next event (operation completion, dispenser expiry)
+		falls inside the window are touched. They are processed in row-major
+		order, like the old per-tile sweep, so `self.progress` is unchanged.
+		Counters of the other pending blocks are caught up lazily by
+		`sync_blocks`.
 		"""
-		# spawn player similar to run_pygame
-		player = None
+		if time <= 0:
+			return
+		self.clock += time
+		due: list[tuple[int, int, int, int]] = []
+		while self._timeline and self._timeline[0][0] <= self.clock:
+			event = heapq.heappop(self._timeline)
+			_, _, x, y = event
+			# skip entries superseded by a later reschedule
+			if self._pending.get((x, y), (None, None))[1] == event[0]:
+				due.append(event)
+		due.sort(key=lambda event: event[1])
+		for _, _, x, y in due:
+			self._advance_block(x, y)
+
+	def sync_blocks(self) -> None:
+		"""Bring remaining_time/elapsed of every pending block up to the clock."""
+		for x, y in list(self._pending):
+			self._advance_block(x, y)
+
+	def _advance_block(self, x: int, y: int) -> None:
+		"""Catch a block up with the clock and queue its next event."""
+		blk = self.grid.objects.get((x, y))
+		entry = self._pending.pop((x, y), None)
+		if entry is not None and entry[0] < self.clock:
+			if isinstance(blk, Appliance):
+				blk.advance(self.clock - entry[0], self.progress)
+			elif isinstance(blk, Dispenser):
+				blk.tick(self.clock - entry[0])
+		self._schedule_block(x, y)
+
+	def _schedule_block(self, x: int, y: int) -> None:
+		blk = self.grid.objects.get((x, y))
+		if not isinstance(blk, (Appliance, Dispenser)):
+			return
+		delay = blk.time_to_event()
+		if delay is None:
+			return
+		fire_at = self.clock + delay
+		self._pending[(x, y)] = (self.clock, fire_at)
+		heapq.heappush(self._timeline, (fire_at, y * len(self.grid[0]) + x, x, y))
+
+	def snapshot(self, player: Player) -> GameState:
+		"""Capture the dynamic state of the level and `player` as a GameState."""
+		self.sync_blocks()
+		appliances = []
+		for x, y in self.appliance_positions:
+			blk = self.grid.objects[(x, y)]
+			op_index = -1 if blk.active_operation is None else blk.operations.index(blk.active_operation)
+			appliances.append((tuple(blk.contents), op_index, blk.remaining_time, blk.op_start_time))
+		return GameState(
+			player=(player.x, player.y, player.orientation),
+			inventory=player.inventory,
+			game_time=player.game_time,
+			clock=self.clock,
+			progress=tuple(self.progress),
+			appliances=tuple(appliances),
+			dispensers=tuple(self.grid.objects[(x, y)].elapsed for x, y in self.dispenser_positions),
+			tables=tuple(self.grid.objects[(x, y)].itemId for x, y in self.table_positions),
+		)
 
-		info_press_counter = 0
+	def restore(self, state: GameState, player: Player) -> None:
+		"""Put the level and `player` back into a state taken with `snapshot`.
 
+		Only interactable blocks are touched, so this costs O(#interactables).
+		"""
+		player.x, player.y, player.orientation = state.player
+		player.inventory = state.inventory
+		player.game_time = state.game_time
+		self.clock = state.clock
+		self.progress = list(state.progress)
+		for (x, y), (contents, op_index, remaining, op_start) in zip(self.appliance_positions, state.appliances):
+			blk = self.grid.objects[(x, y)]
+			blk.contents = list(contents)
+			blk.active_operation = None if op_index == -1 else blk.operations[op_index]
+			blk.remaining_time = remaining
+			blk.op_start_time = op_start
+		for (x, y), elapsed in zip(self.dispenser_positions, state.dispensers):
+			self.grid.objects[(x, y)].elapsed = elapsed
+		for (x, y), item in zip(self.table_positions, state.tables):
+			blk = self.grid.objects[(x, y)]
+			blk.pop_item()
+			if item is not None:
+				blk.add_item(item)
+		# requeue the timers from the restored counters
+		self._timeline = []
+		self._pending = {}
+		for x, y in self.appliance_positions + self.dispenser_positions:
+			self._schedule_block(x, y)
+
+	def clone(self) -> "Game":
+		"""Return an independent copy of this game.
+
+		Walls, floors, operations and the level are shared; only the
+		interactable blocks and the bookkeeping around them are copied.
+		"""
+		new = copy.copy(self)
+		objects = {}
+		for pos, blk in self.grid.objects.items():
+			blk = copy.copy(blk)
+			if isinstance(blk, Appliance):
+				blk.contents = list(blk.contents)
+			objects[pos] = blk
+		new.grid = self.grid.with_objects(objects)
+		new.appliances_by_id = {}
+		for x, y in self.appliance_positions:
+			new.appliances_by_id.setdefault(new.grid[y][x].id, []).append(new.grid[y][x])
+		new.progress = list(self.progress)
+		new._timeline = list(self._timeline)
+		new._pending = dict(self._pending)
+		return new
+
+	def spawn_player(self) -> Player:
+		"""Create a Player at the level start position.
+
+		Falls back to the first walkable tile (top-left search) when the level
+		has no usable start marker.
+		"""
+		player = None
 		if getattr(self, "start_pos", None) is not None:
 			x, y = self.start_pos
 			if (
@@ -879,124 +1170,221 @@ class Game:
 					break
 		if player is None:
 			raise RuntimeError("No walkable tile found to place the player")
+		return player
 
-		self.__print_info()
-		while True:
+	def apply_command(self, player: Player, cmd: str, use_pathfinding_control: bool = True) -> str | None:
+		"""Execute a single text-mode command for `player`.
+
+		Prints the same messages as the interactive loop and returns what
+		happened so callers can decide how to continue:
+		- "exit", "repeat", "continue", "level_skip" : the level should end
+		- "goal" : the player now holds the goal item
+		- "info" : level info was printed
+		- None : anything else (the game continues)
+		"""
+		if cmd in ("quit", "exit"):
+			print("Exiting")
+			return "exit"
+		if cmd == "info":
+			self.__print_info()
+			return "info"
+		if cmd == "restart":
+			return "repeat"
+		if cmd == "give_up":
+			return "continue"
+		if cmd == "level_skip":
+			return "level_skip"
+		if cmd == "skip":
+			# pass time without moving
+			player.pass_time()
+			# tick appliances same as on move
+			self.tick_blocks(1)
 			self.__print_board(player)
-			cmd = input(" > ").strip().lower()
-			if not cmd:
-				continue
-			if cmd in ("quit", "exit"):
-				print("Exiting")
-				return 0, player.game_time, "exit", info_press_counter, self.progress
-			if cmd == "info":
-				info_press_counter += 1
-				self.__print_info()
-				continue
-			if cmd == "restart":
-				return 0, player.game_time, "repeat", info_press_counter, self.progress
-			if cmd == "give_up":
-				return 0, player.game_time, "continue", info_press_counter, self.progress
-			if cmd == "level_skip":
-				return -1, player.game_time, "level_skip", info_press_counter, self.progress
-			if cmd == "skip":
-				# pass time without moving
-				player.pass_time()
-				# tick appliances same as on move
+			return None
+		if cmd == "drop":
+			print(f"Dropped current item: {player.inventory}")
+			player.inventory = None
+			return None
+		if not use_pathfinding_control and cmd in _MOVES:
+			orientation, dx, dy = _MOVES[cmd]
+			# update orientation (even if movement blocked)
+			player.set_orientation(orientation)
+			if player.try_move(dx, dy, self.grid):
+				# advance appliances by one game step; finished ops start the next one
 				self.tick_blocks(1)
-				self.__print_board(player)
-				continue
-			if cmd == "drop":
-				print(f"Dropped current item: {player.inventory}")
-				player.inventory = None
-				continue
+			return None
+		if not use_pathfinding_control and cmd == "interact":
+			tx, ty = player.facing_tile()
+			facing_in_grid = 0 <= ty < len(self.grid) and 0 <= tx < len(self.grid[0])
+			if facing_in_grid:
+				self._advance_block(tx, ty)
+			player.interact(self.grid)
+			if facing_in_grid:
+				# an operation may have started; queue its completion
+				self._advance_block(tx, ty)
+
+			# mark item time if not yet found
+			if player.inventory is not None and self.progress[player.inventory-1] == -1:
+				self.progress[player.inventory-1] = player.game_time
+
+			# check goal achievement
+			if self.goal is not None and player.inventory == self.goal:
+				print(
+					f"Goal achieved: player has item {self.goal} at time {player.game_time}"
+				)
+				return "goal"
+			return None
+
+		
+		nav_cmd = INTERACT_RE.match(cmd)
+		if use_pathfinding_control and nav_cmd:
+			goal_x = int(nav_cmd.group(1))
+			goal_y = int(nav_cmd.group(2))
+
+			if goal_x < 0 or goal_y < 0 or goal_x >= len(self.grid[0]) or goal_y >= len(self.grid):
+				print("The inserted position is outside the boundaries of the level")
+				return None
+			if not any(isinstance(self.grid[goal_y][goal_x], target) for target in [Dispenser, Appliance, Table]):
+				print("Invalid position. Only Appliances, Dispensers, and Tables are interactable")
+				return None
+
+			distance_traveled, next_position = self.find_route((player.x, player.y), (goal_x, goal_y))
+
+			if distance_traveled == -1:
+				print("Position is unreachable") 
+				return None
+
+			player.game_time += distance_traveled
+
+			# tick appliances and attempt to start ops
+			self.tick_blocks(distance_traveled)
+
+			player.y = next_position.y
+			player.x = next_position.x
+
+			if next_position.x + 1  == goal_x:
+				player.set_orientation("right")
+			elif next_position.x -1  == goal_x:
+				player.set_orientation("left")
+			elif next_position.y + 1  == goal_y:
+				player.set_orientation("down")
+			elif next_position.y - 1  == goal_y:
+				player.set_orientation("up")
+
+			self._advance_block(goal_x, goal_y)
+			changed = player.interact(self.grid)
+			# an operation may have started; queue its completion
+			self._advance_block(goal_x, goal_y)
+			# mark item time if not yet found
+			if player.inventory is not None and self.progress[player.inventory-1] == -1:
+				self.progress[player.inventory-1] = player.game_time
+
+			# if interact failed because of ongoing operation, implicitly skip time and try again
+			target = self.grid[goal_y][goal_x]
+			if not changed and isinstance(target, Appliance) and target.remaining_time > 0:
+				print(f"Appliance is busy, skipping {target.remaining_time} game time to interact")
+				player.game_time += self.grid[goal_y][goal_x].remaining_time
+				self.tick_blocks(target.remaining_time)
+				changed = player.interact(self.grid)
+				self._advance_block(goal_x, goal_y)
 
+			if changed:
+				print("Interaction succeeded")
+				if self.goal is not None and player.inventory == self.goal:
+					print(
+						f"Goal achieved: player has item {self.goal} at time {player.game_time}"
+					)
+					return "goal"
+			else:
+				print("Nothing happened")
 			
-			interact_patter=r"interact\s*\(\s*(-?\d+)\s*,\s*(-?\d+)\s*\)"
-			nav_cmd = re.match(interact_patter,cmd)
-			if use_pathfinding_control and nav_cmd:
-				goal_x = int(nav_cmd.group(1))
-				goal_y = int(nav_cmd.group(2))
-
-				if goal_x < 0 or goal_y < 0 or goal_x >= len(self.grid[0]) or goal_y >= len(self.grid):
-					print("The inserted position is outside the boundaries of the level")
-					continue
-				if not any(isinstance(self.grid[goal_y][goal_x], target) for target in [Dispenser, Appliance, Table]):
-					print("Invalid position. Only Appliances, Dispensers, and Tables are interactable")
-					continue
+			return None
 
-				distance_traveled, next_position = pathfind_neighbor_any(self.grid,Position(player.x,player.y),Position(goal_x,goal_y))	
+		# unknown command
+		if use_pathfinding_control:
+			print("Unknown command. Use interact (x, y), info, drop")
+		return None
 
-				if distance_traveled == -1:
-					print("Position is unreachable") 
-					continue
+	def run_text(self, use_pathfinding_control: bool = True, auto_continue = True, log: CommandLog | None = None):
+		"""Run a simple text-mode loop.
 
-				player.game_time += distance_traveled
+		Commands in normal mode:
+		- up, down, left, right : attempt to move in that direction (orientation sets first)
+		- interact : interact with the tile in front (pick/place)
+		Commands in pathfinfing mode:
+		- interact (x,y) : pathfind to the block at (x,y) and attempt to interact with it (pick/place)
+		Universal commands:
+		- info : print level description and mapping
+		- quit : exit
+		- skip : skip time
+		- drop : empty inventory
 
-				# tick appliances and attempt to start ops
-				self.tick_blocks(distance_traveled)
+		Movement steps advance game time and tick appliances; other commands do not advance time.
 
-				player.y = next_position.y
-				player.x = next_position.x
+		If `log` is given, every command is recorded in it together with the
+		hash of the resulting state (see replay.py).
+		"""
+		return run_with_input(self.text_steps(use_pathfinding_control, auto_continue, log))
 
-				if next_position.x + 1  == goal_x:
-					player.set_orientation("right")
-				elif next_position.x -1  == goal_x:
-					player.set_orientation("left")
-				elif next_position.y + 1  == goal_y:
-					player.set_orientation("down")
-				elif next_position.y - 1  == goal_y:
-					player.set_orientation("up")
+	def text_steps(self, use_pathfinding_control: bool = True, auto_continue = True, log: CommandLog | None = None):
+		"""Generator form of `run_text`.
 
-				changed = player.interact(self.grid)
-				# mark item time if not yet found
-				if player.inventory is not None and self.progress[player.inventory-1] == -1:
-					self.progress[player.inventory-1] = player.game_time
-
-				# if interact failed because of ongoing operation, implicitly skip time and try again
-				target = self.grid[goal_y][goal_x]
-				if not changed and isinstance(target, Appliance) and target.remaining_time > 0:
-					print(f"Appliance is busy, skipping {target.remaining_time} game time to interact")
-					player.game_time += self.grid[goal_y][goal_x].remaining_time
-					self.tick_blocks(target.remaining_time)
-					changed = player.interact(self.grid)
-
-				if changed:
-					print("Interaction succeeded")
-					if self.goal is not None and player.inventory == self.goal:
-						print(
-							f"Goal achieved: player has item {self.goal} at time {player.game_time}"
-						)
-						choice = "c" if auto_continue else None
-						while choice not in ("r", "c", "e"):
-							choice = (
-								input(
-									"Level complete. (r) repeat, (c) continue, (e) exit: "
-								)
-								.strip()
-								.lower()
-							)
-							if choice not in ("r", "c", "e"):
-								print("Please choose r, c or e")
-						if choice == "r":
-							return 1, player.game_time, "repeat", info_press_counter, self.progress
-						if choice == "c":
-							return (
-								1,
-								player.game_time,
-								"continue",
-								info_press_counter, self.progress
-							)
-						return 1, player.game_time, "exit", info_press_counter, self.progress
-				else:
-					print("Nothing happened")
-				
-				continue
+		Prints exactly what `run_text` prints, but yields each input prompt
+		instead of reading stdin and expects the typed line back through
+		`send`. Returns the same tuple as `run_text`.
+		"""
+		# spawn player similar to run_pygame
+		player = self.spawn_player()
+
+		info_press_counter = 0
 
-			# unknown command
-			if use_pathfinding_control:
-				print("Unknown command. Use interact (x, y), info, drop")
+		self.__print_info()
+		while True:
+			self.__print_board(player)
+			cmd = (yield " > ").strip().lower()
+			if not cmd:
+				continue
+			outcome = self.apply_command(player, cmd, use_pathfinding_control)
+			if log is not None:
+				log.record(cmd, self.snapshot(player))
+			if outcome == "info":
+				info_press_counter += 1
+				continue
+			if outcome in ("exit", "repeat", "continue"):
+				return 0, player.game_time, outcome, info_press_counter, self.progress
+			if outcome == "level_skip":
+				return -1, player.game_time, "level_skip", info_press_counter, self.progress
+			if outcome == "goal":
+				choice = "c" if auto_continue else None
+				while choice not in ("r", "c", "e"):
+					choice = (
+						(yield "Level complete. (r) repeat, (c) continue, (e) exit: ")
+						.strip()
+						.lower()
+					)
+					if choice not in ("r", "c", "e"):
+						print("Please choose r, c or e")
+				if choice == "r":
+					return 1, player.game_time, "repeat", info_press_counter, self.progress
+				if choice == "c":
+					return (
+						1,
+						player.game_time,
+						"continue",
+						info_press_counter, self.progress
+					)
+				return 1, player.game_time, "exit", info_press_counter, self.progress
 
 
 if __name__ == "__main__":
-	asyncio.run(play_levels(start_folder="levels", use_text=True, pathfinding_controls=True))
+	import argparse
+
+	parser = argparse.ArgumentParser(description="Play the levels in text mode with pathfinding controls")
+	parser.add_argument("levels_dir", nargs="?", default="levels", help="Levels folder or level pack (.zip)")
+	parser.add_argument("--record", metavar="DIR", help="Write a command log of every level played to DIR (see replay.py)")
+	parser.add_argument("--show-distances", action="store_true", help="List the walking distance to every interactable under the board")
+	args = parser.parse_args()
+	asyncio.run(play_levels(
+		start_folder="levels", use_text=True, pathfinding_controls=True, record_dir=args.record,
+		show_distances=args.show_distances, levels_dir=args.levels_dir,
+	))
@@ -1,9 +1,12 @@
 import json
 import asyncio
+import contextlib
+import io
 import sys
 from pathlib import Path
 from datetime import datetime
 from typing import Tuple, List
+from states import LEVEL_PACK_SUFFIX, open_pack, split_pack_path
 try:
 	import pygame
 
@@ -53,8 +56,12 @@ def list_levels_dir(levels_dir: str = "levels") -> list[str]:
 	"""Return a sorted list of level folder paths inside `levels_dir`.
 
 	Sorting is natural lexicographic so level1, level2, ... order is preserved.
+	`levels_dir` may also be a level pack (see `states.LevelPack`); its
+	levels are listed without reading them.
 	"""
 	p = Path(levels_dir)
+	if p.is_file() and p.suffix == LEVEL_PACK_SUFFIX:
+		return open_pack(p).level_paths()
 	if not p.exists() or not p.is_dir():
 		return []
 	entries = [str(x) for x in p.iterdir() if x.is_dir()]
@@ -63,6 +70,33 @@ def list_levels_dir(levels_dir: str = "levels") -> list[str]:
 	return entries
 
 
+def level_paths(paths: List[str]) -> List[str]:
+	"""Expand folders of levels and level packs into level paths.
+
+	A level folder or a level inside a pack is kept as is; anything else is
+	listed with `list_levels_dir`.
+	"""
+	levels = []
+	for path in paths:
+		if (Path(path) / "maze.txt").exists() or split_pack_path(path) is not None:
+			levels.append(path)
+		else:
+			levels.extend(list_levels_dir(path))
+	return levels
+
+
+class Discard(io.TextIOBase):
+	"""Write-only sink used to swallow the game's console messages."""
+
+	def write(self, s: str) -> int:
+		return len(s)
+
+
+def quiet() -> contextlib.AbstractContextManager:
+	"""Context manager that discards everything printed to stdout inside it."""
+	return contextlib.redirect_stdout(Discard())
+
+
 async def prompt_username_pygame(tile_size: int = 128) -> str:
 	"""Show a simple pygame text-input overlay and return the entered username.
 
@@ -0,0 +1,396 @@
+"""Procedural level generator.
+
+Builds random kitchens (walls, dispensers, appliances, tables) and recipe
+trees of a given depth, and writes them in the usual level folder format
+(`maze.txt`, `recipe.txt`, `mapping.txt`, `desc.txt`) or into a level pack.
+Levels are generated across a process pool, one seed per candidate, so the
+same seed and options always give the same levels.
+
+A candidate is kept only if it is provably solvable: every interactable is
+reachable from the start and a simple scripted run (fetch every ingredient
+in recipe order, then collect each product), played on the real game
+rules, reaches the goal. Dispenser limits (`N ! T`) are set from that run,
+so they bind without making the level unsolvable. Candidates whose
+scripted run finishes in fewer than `--min-time` steps are rejected as
+trivial.
+
+Usage:
+    python levelgen.py --count 1000 --out levels_generated
+    python levelgen.py --count 5000 --out packs/generated.zip --width 24 --height 12 --depth 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from game import Game  # type: ignore
+from game_utils import quiet
+from states import LEVEL_PACK_SUFFIX, Level, Operation
+
+# names for dispensed ingredients and appliances (most have an asset)
+INGREDIENT_NAMES = [
+    "apple", "butter", "chicken", "egg", "flour", "milk", "oil", "potatoes", "salt",
+    "cream", "chickpeas", "bread", "fish fillet", "cocoa powder", "lime juice", "coconut milk",
+]
+APPLIANCE_NAMES = [
+    "pan", "bowl", "oven", "fridge", "blender", "cutting board", "cooking pot", "strainer",
+    "stand mixer", "plate", "serving tray", "cup",
+]
+# start markers understood by the level loader
+_MARKERS = {"up": "^", "down": "v", "left": "<", "right": ">"}
+# appliances hold at most this many items (see Player.interact)
+_MAX_CONTENTS = 4
+
+
+@dataclass
+class GeneratorOptions:
+    """Parameters of generated levels.
+
+    Attributes:
+        width, height: int -- maze size in tiles, outer walls included
+        walls: float -- share of inner tiles turned into walls
+        ingredients: int -- distinct dispensed ingredients to draw from (at most 9)
+        appliances: int -- distinct appliances to draw from (at most 26)
+        depth: int -- depth of the recipe tree (1 = one operation on dispensed items)
+        max_inputs: int -- most ingredients per operation (at most 4)
+        max_time: int -- longest operation duration
+        tables: int -- tables placed on the walls
+        expiring: float -- share of dispensers that stop after a time limit
+        expiry_slack: int -- most extra steps a dispenser limit allows
+        min_time: int -- reject levels the scripted run finishes faster
+    """
+
+    width: int = 16
+    height: int = 8
+    walls: float = 0.2
+    ingredients: int = 6
+    appliances: int = 4
+    depth: int = 2
+    max_inputs: int = 3
+    max_time: int = 10
+    tables: int = 0
+    expiring: float = 0.0
+    expiry_slack: int = 10
+    min_time: int = 15
+
+
+class _Reject(Exception):
+    """Raised when a candidate level does not qualify; the message says why."""
+
+
+def _build_recipe(rng: random.Random, opts: GeneratorOptions) -> Tuple[List[Operation], int]:
+    """Random recipe tree of depth `opts.depth`; returns (operations, goal).
+
+    Operations are listed children first. On one appliance no operation's
+    ingredients may be a sub-multiset of another's, or filling it would start
+    the wrong operation, and an operation taking a single item avoids the
+    appliance that item is made on (the finished product would restart it
+    straight away). An operation also avoids the appliances needed for
+    its second and later produced ingredients, which `scripted_run` makes
+    while the first ones already sit in the appliance.
+    """
+    letters = [chr(ord("A") + i) for i in range(min(opts.appliances, 26))]
+    ops: List[Operation] = []
+    next_id = [10]
+
+    def conflicts(ingredients: Counter, letter: str) -> bool:
+        for op in ops:
+            if op.appliance != letter:
+                continue
+            if Counter([op.product]) == ingredients:
+                return True
+            other = Counter(op.ingredients)
+            if not ingredients - other or not other - ingredients:
+                return True
+        return False
+
+    def build(depth: int) -> Tuple[int, set]:
+        """Item made by a subtree of `depth`, and the appliances it uses."""
+        if depth == 0:
+            return rng.randint(1, opts.ingredients), set()
+        count = rng.randint(1, min(opts.max_inputs, _MAX_CONTENTS))
+        children = [build(depth - 1)] + [build(rng.randint(0, depth - 1)) for _ in range(count - 1)]
+        rng.shuffle(children)
+        inputs = [item for item, _ in children]
+        used = set().union(*(uses for _, uses in children))
+        produced = [uses for item, uses in children if item >= 10]
+        busy = set().union(*produced[1:])
+        options = [letter for letter in letters if letter not in busy and not conflicts(Counter(inputs), letter)]
+        if not options:
+            raise _Reject("recipe")
+        op = Operation(inputs, rng.choice(options), next_id[0], rng.randint(1, opts.max_time))
+        next_id[0] += 1
+        ops.append(op)
+        return op.product, used | {op.appliance}
+
+    build(opts.depth)
+    # number dispensed items 1..k and products k+1.., goal last
+    bases = sorted({i for op in ops for i in op.ingredients if i < 10})
+    ids = {old: new for new, old in enumerate(bases, start=1)}
+    for new, op in enumerate(ops, start=len(bases) + 1):
+        ids[op.product] = new
+    ops = [Operation([ids[i] for i in op.ingredients], op.appliance, ids[op.product], op.time) for op in ops]
+    return ops, ops[-1].product
+
+
+def _build_maze(
+    rng: random.Random, opts: GeneratorOptions, objects: List[str]
+) -> Tuple[List[List[str]], Tuple[int, int]]:
+    """Random walls, a start tile and `objects` placed on walls next to the
+    floor region connected to the start. Returns (rows, start)."""
+    width, height = opts.width, opts.height
+    if width < 4 or height < 4:
+        raise ValueError("levels must be at least 4x4")
+    rows = [["#"] * width for _ in range(height)]
+    for y in range(1, height - 1):
+        for x in range(1, width - 1):
+            if rng.random() >= opts.walls:
+                rows[y][x] = "."
+    floors = [(x, y) for y in range(1, height - 1) for x in range(1, width - 1) if rows[y][x] == "."]
+    if not floors:
+        raise _Reject("layout")
+    start = rng.choice(floors)
+
+    # keep only the floor connected to the start
+    region = {start}
+    stack = [start]
+    while stack:
+        x, y = stack.pop()
+        for n in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if rows[n[1]][n[0]] == "." and n not in region:
+                region.add(n)
+                stack.append(n)
+    for x, y in floors:
+        if (x, y) not in region:
+            rows[y][x] = "#"
+
+    sites = [
+        (x, y)
+        for y in range(height)
+        for x in range(width)
+        if rows[y][x] == "#" and any(n in region for n in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)))
+    ]
+    if len(sites) < len(objects):
+        raise _Reject("layout")
+    for (x, y), ch in zip(rng.sample(sites, len(objects)), objects):
+        rows[y][x] = ch
+    return rows, start
+
+
+def _level_files(
+    seed: int,
+    rows: List[List[str]],
+    start: Tuple[int, int],
+    orientation: str,
+    ops: List[Operation],
+    goal: int,
+    limits: Dict[int, int],
+    names: Dict[str, str],
+) -> Dict[str, str]:
+    """Contents of maze.txt, recipe.txt, mapping.txt and desc.txt."""
+    maze = [list(row) for row in rows]
+    maze[start[1]][start[0]] = _MARKERS[orientation]
+    bases = sorted({i for op in ops for i in op.ingredients if i < ops[0].product})
+    letters = sorted({op.appliance for op in ops})
+
+    recipe = [
+        f"Ingredients: {', '.join(str(i) for i in bases)}",
+        f"Appliances: {', '.join(letters)}",
+        f"Goal: {goal}",
+    ]
+    recipe += [f"{', '.join(str(i) for i in op.ingredients)} -> {op.appliance} = {op.product} ({op.time})" for op in ops]
+    recipe += [f"{item} ! {time}" for item, time in sorted(limits.items())]
+
+    mapping = ["Items:"] + [f"{i} = {names[str(i)]}" for i in range(1, goal + 1)]
+    mapping += ["Appliances:"] + [f"{letter} = {names[letter]}" for letter in letters]
+
+    desc = [f"Generated kitchen {seed}", ""]
+    for op in ops:
+        what = ", ".join(names[str(i)] for i in op.ingredients)
+        desc.append(f"Put {what} into the {names[op.appliance]} for {op.time} minutes to get {names[str(op.product)]}.")
+    for item, time in sorted(limits.items()):
+        desc.append(f"The {names[str(item)]} dispenser runs out after {time} minutes.")
+
+    return {
+        "maze.txt": "\n".join("".join(row) for row in maze) + "\n",
+        "recipe.txt": "\n".join(recipe) + "\n",
+        "mapping.txt": "\n".join(mapping) + "\n",
+        "desc.txt": "\n".join(desc) + "\n",
+    }
+
+
+def scripted_run(level: Level) -> Tuple[Optional[int], Dict[int, int]]:
+    """Play `level` with a fixed strategy and report how it went.
+
+    For every operation (children first) the player fetches each ingredient,
+    produced ones before dispensed ones, places it into the appliance and
+    then waits for and collects the product. Returns the game time at which
+    the goal is held (None if the strategy fails) and the last time each
+    dispenser was used.
+    """
+    last_use: Dict[int, int] = {}
+    with quiet():
+        game = Game.from_level(level)
+        player = game.spawn_player()
+        producers = {op.product: op for op in game.operations if isinstance(op, Operation)}
+        dispensers = {int(game.grid.objects[pos].id): pos for pos in game.dispenser_positions}
+        appliances = {game.grid.objects[pos].id: pos for pos in game.appliance_positions}
+
+        def visit(pos: Tuple[int, int]) -> None:
+            game.apply_command(player, f"interact ({pos[0]},{pos[1]})")
+
+        def produce(item: int) -> bool:
+            if item not in producers:
+                if item not in dispensers:
+                    return False
+                visit(dispensers[item])
+                last_use[item] = player.game_time
+                return player.inventory == item
+            op = producers[item]
+            pos = appliances[op.appliance]
+            ordered = [i for i in op.ingredients if i in producers] + [i for i in op.ingredients if i not in producers]
+            for ingredient in ordered:
+                if not produce(ingredient):
+                    return False
+                visit(pos)
+                if player.inventory is not None:
+                    return False
+            visit(pos)
+            return player.inventory == item
+
+        done = produce(game.goal)
+    return (player.game_time if done else None), last_use
+
+
+def generate_level(seed: int, opts: GeneratorOptions) -> Tuple[int, Optional[Dict[str, str]], str]:
+    """Generate the candidate level for `seed`.
+
+    Returns (seed, files, "ok") for an accepted level, or (seed, None, reason)
+    with reason one of "recipe", "layout", "unreachable", "unsolved",
+    "trivial".
+    """
+    rng = random.Random(seed)
+    try:
+        ops, goal = _build_recipe(rng, opts)
+        bases = sorted({i for op in ops for i in op.ingredients if i < ops[0].product})
+        letters = sorted({op.appliance for op in ops})
+        if len(bases) > 9:
+            raise _Reject("recipe")
+        objects = [str(i) for i in bases] + letters + ["*"] * opts.tables
+        rows, start = _build_maze(rng, opts, objects)
+        orientation = rng.choice(list(_MARKERS))
+
+        names = {}
+        for i, name in zip(bases, rng.sample(INGREDIENT_NAMES, len(bases))):
+            names[str(i)] = name
+        for letter, name in zip(letters, rng.sample(APPLIANCE_NAMES * 3, len(letters))):
+            names[letter] = name
+        for op in ops:
+            names[str(op.product)] = "final dish" if op.product == goal else f"intermediate {op.product}"
+
+        files = _level_files(seed, rows, start, orientation, ops, goal, {}, names)
+        level = Level.from_files(f"generated/{seed}", files)
+        with quiet():
+            game = Game.from_level(level)
+        if len(game.routes_from(start)) != len(game.grid.objects):
+            raise _Reject("unreachable")
+        finish, last_use = scripted_run(level)
+        if finish is None:
+            raise _Reject("unsolved")
+        if finish < opts.min_time:
+            raise _Reject("trivial")
+
+        # a dispenser is empty once its elapsed time reaches the limit
+        limits = {
+            item: time + 1 + rng.randint(0, opts.expiry_slack)
+            for item, time in last_use.items()
+            if rng.random() < opts.expiring
+        }
+        if limits:
+            files = _level_files(seed, rows, start, orientation, ops, goal, limits, names)
+            if scripted_run(Level.from_files(f"generated/{seed}", files))[0] is None:
+                raise _Reject("unsolved")
+    except _Reject as e:
+        return seed, None, str(e)
+    return seed, files, "ok"
+
+
+def generate(
+    count: int, opts: GeneratorOptions, seed: int = 0, workers: int | None = None
+) -> Tuple[List[Tuple[int, Dict[str, str]]], Counter]:
+    """Generate `count` accepted levels from consecutive seeds starting at `seed`.
+
+    Candidates are spread over a process pool. Returns the accepted
+    (seed, files) pairs in seed order and a Counter of outcomes.
+    """
+    accepted: List[Tuple[int, Dict[str, str]]] = []
+    outcomes: Counter = Counter()
+    next_seed = seed
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while len(accepted) < count:
+            batch = range(next_seed, next_seed + max(2 * (count - len(accepted)), 64))
+            next_seed = batch.stop
+            for level_seed, files, outcome in pool.map(partial(generate_level, opts=opts), batch, chunksize=16):
+                outcomes[outcome] += 1
+                if files is not None and len(accepted) < count:
+                    accepted.append((level_seed, files))
+            if not accepted and sum(outcomes.values()) >= 100 * max(count, 10):
+                raise RuntimeError(f"No level accepted after {sum(outcomes.values())} candidates: {dict(outcomes)}")
+    return accepted, outcomes
+
+
+def write_levels(levels: List[Tuple[int, Dict[str, str]]], out: str | Path) -> None:
+    """Write levels as folders under `out`, or into a level pack if `out` ends in .zip."""
+    out = Path(out)
+    width = len(str(len(levels)))
+    names = [f"level{i:0{width}d}" for i in range(len(levels))]
+    if out.suffix == LEVEL_PACK_SUFFIX:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, (_, files) in zip(names, levels):
+                for filename, text in files.items():
+                    zf.writestr(f"{name}/{filename}", text)
+        return
+    for name, (_, files) in zip(names, levels):
+        folder = out / name
+        folder.mkdir(parents=True, exist_ok=True)
+        for filename, text in files.items():
+            (folder / filename).write_text(text, encoding="utf-8")
+
+
+def main() -> int:
+    defaults = GeneratorOptions()
+    parser = argparse.ArgumentParser(description="Generate random solvable cookenv levels")
+    parser.add_argument("--count", type=int, default=100, help="Number of levels to generate")
+    parser.add_argument("--out", type=str, default="levels_generated", help="Output folder, or a .zip level pack")
+    parser.add_argument("--seed", type=int, default=0, help="First candidate seed")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    opts = GeneratorOptions(**{name: getattr(args, name) for name in asdict(defaults)})
+    if not 1 <= opts.ingredients <= 9:
+        parser.error("--ingredients must be between 1 and 9")
+    if opts.depth < 1:
+        parser.error("--depth must be at least 1")
+    levels, outcomes = generate(args.count, opts, args.seed, args.workers)
+    write_levels(levels, args.out)
+    print(f"{len(levels)} levels written to {args.out} ({sum(outcomes.values())} candidates: {dict(outcomes)})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
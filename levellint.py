@@ -0,0 +1,223 @@
+"""Static checks for level folders.
+
+Loads each level with `Level.load_from_folder` and `Game.from_text_map`,
+runs one search from the start tile and checks that the level can be
+finished at all:
+
+- the files load and the maze is well formed, and the level has a goal
+- every interactable can be reached from the start
+- every operation names an appliance that is on the map, has at most 4
+  ingredients, and uses only items that are dispensed or produced
+- the recipe graph (ingredient -> product) has no cycles
+- the goal can be derived from the dispensers and appliances that can be
+  reached, leaving out dispensers that run out (`N ! T`) before the
+  player can get to them
+
+Problems that make a level unplayable are errors; the rest (unused
+unreachable blocks, operations that may start in place of others, a
+missing start marker) are warnings. Levels are checked in a process pool;
+one JSON line per level goes to stdout and a summary to stderr. The exit
+code is 1 if any level has errors.
+
+Usage:
+    python levellint.py levels level_archive
+    python levellint.py packs/generated.zip --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from bfs import Position, neighbor_routes
+from blocks import Appliance, Dispenser, Table  # type: ignore
+from game import Game  # type: ignore
+from game_utils import level_paths, quiet
+from states import DispenserTimeLimit, Level, Operation
+
+# appliances hold at most this many items (see Player.interact)
+MAX_CONTENTS = 4
+
+
+@dataclass
+class LintResult:
+    """Findings for one level.
+
+    Attributes:
+        level: str -- level folder (or pack path)
+        errors: list[dict] -- {"code", "message"} per problem that makes the level unplayable
+        warnings: list[dict] -- {"code", "message"} per suspicious but playable detail
+    """
+
+    level: str
+    errors: List[Dict[str, str]] = field(default_factory=list)
+    warnings: List[Dict[str, str]] = field(default_factory=list)
+
+    def error(self, code: str, message: str) -> None:
+        self.errors.append({"code": code, "message": message})
+
+    def warning(self, code: str, message: str) -> None:
+        self.warnings.append({"code": code, "message": message})
+
+
+def _find_cycle(ops: List[Operation]) -> List[int] | None:
+    """Items of one cycle in the ingredient -> product graph, or None."""
+    edges: Dict[int, set] = {}
+    for op in ops:
+        for item in op.ingredients:
+            edges.setdefault(item, set()).add(op.product)
+    state: Dict[int, int] = {}  # 1 = on the DFS stack, 2 = done
+    for root in sorted(edges):
+        if root in state:
+            continue
+        path = [root]
+        stack = [iter(sorted(edges.get(root, ())))]
+        state[root] = 1
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                state[path.pop()] = 2
+                stack.pop()
+            elif state.get(item) == 1:
+                return path[path.index(item):]
+            elif item not in state:
+                state[item] = 1
+                path.append(item)
+                stack.append(iter(sorted(edges.get(item, ()))))
+    return None
+
+
+def lint_level(path: str) -> LintResult:
+    """Check the level at `path` (a folder or `<pack>.zip/<level>`)."""
+    result = LintResult(level=path)
+    try:
+        level = Level.load_from_folder(path)
+    except (OSError, RuntimeError, ValueError) as e:
+        result.error("load", str(e))
+        return result
+    if level.goal is None:
+        result.error("goal", "recipe.txt has no Goal line")
+        return result
+    try:
+        with quiet():
+            game = Game.from_text_map(
+                level.maze_lines, level.goal, mapping=level.mapping, operations=level.operations, compiled=level.compiled
+            )
+    except ValueError as e:
+        result.error("maze", str(e))
+        return result
+
+    ops = [op for op in level.operations if isinstance(op, Operation)]
+    limits = [op for op in level.operations if isinstance(op, DispenserTimeLimit)]
+    objects = game.grid.objects
+
+    # one search from the start covers every block
+    if level.start_pos is None:
+        result.warning("start", "maze.txt has no start marker; the first floor tile is used")
+    game.start_pos = level.start_pos
+    with quiet():
+        player = game.spawn_player()
+    routes = neighbor_routes(game.grid, Position(player.x, player.y), objects)
+
+    letters_on_map = {block.id for block in objects.values() if isinstance(block, Appliance)}
+    needed_letters = {op.appliance for op in ops}
+    dispensed = {int(block.id) for block in objects.values() if isinstance(block, Dispenser) and block.id.isdigit()}
+    produced = {op.product for op in ops}
+    needed_items = {item for op in ops for item in op.ingredients}
+
+    for (x, y), block in sorted(objects.items(), key=lambda item: (item[0][1], item[0][0])):
+        if (x, y) in routes:
+            continue
+        if isinstance(block, Appliance) and block.id in needed_letters:
+            result.error("unreachable", f"appliance {block.id} at ({x},{y}) cannot be reached")
+        elif isinstance(block, Dispenser) and block.id.isdigit() and int(block.id) in needed_items | {level.goal}:
+            result.error("unreachable", f"dispenser {block.id} at ({x},{y}) cannot be reached")
+        else:
+            kind = "table" if isinstance(block, Table) else type(block).__name__.lower()
+            result.warning("unreachable", f"unused {kind} at ({x},{y}) cannot be reached")
+
+    for op in ops:
+        name = f"{', '.join(str(i) for i in op.ingredients)} -> {op.appliance} = {op.product}"
+        if op.appliance not in letters_on_map:
+            result.error("appliance", f"operation {name}: appliance {op.appliance} is not on the map")
+        if len(op.ingredients) > MAX_CONTENTS:
+            result.error("capacity", f"operation {name}: appliances hold at most {MAX_CONTENTS} items")
+        for item in sorted(set(op.ingredients) - dispensed - produced):
+            result.error("ingredient", f"operation {name}: item {item} is neither dispensed nor produced")
+
+    for i, op in enumerate(ops):
+        for other in ops[i + 1:]:
+            if op.appliance != other.appliance:
+                continue
+            a, b = Counter(op.ingredients), Counter(other.ingredients)
+            if not a - b or not b - a:
+                result.warning(
+                    "ambiguous",
+                    f"appliance {op.appliance}: ingredients {op.ingredients} and {other.ingredients} overlap, "
+                    "so one operation can start in place of the other",
+                )
+
+    cycle = _find_cycle(ops)
+    if cycle is not None:
+        result.error("cycle", f"recipe cycle through items {' -> '.join(str(i) for i in cycle + cycle[:1])}")
+
+    # dispensers the player can reach before they run out
+    expiry = {limit.dispenser: limit.expTime for limit in limits}
+    for item in sorted(set(expiry) - dispensed):
+        result.warning("expiry", f"time limit for dispenser {item}, which is not on the map")
+    available = set()
+    for pos, block in objects.items():
+        if not isinstance(block, Dispenser) or not block.id.isdigit() or pos not in routes:
+            continue
+        item = int(block.id)
+        distance = routes[pos][0]
+        if item in expiry and distance >= expiry[item]:
+            result.error(
+                "expiry",
+                f"dispenser {item} at ({pos[0]},{pos[1]}) runs out after {expiry[item]} steps but is {distance} steps from the start",
+            )
+            continue
+        available.add(item)
+
+    # derive items from usable dispensers through reachable appliances
+    reachable_letters = {block.id for pos, block in objects.items() if isinstance(block, Appliance) and pos in routes}
+    changed = True
+    while changed:
+        changed = False
+        for op in ops:
+            if op.product not in available and op.appliance in reachable_letters and set(op.ingredients) <= available:
+                available.add(op.product)
+                changed = True
+    if level.goal not in available:
+        result.error("goal", f"goal item {level.goal} cannot be made from the reachable dispensers and appliances")
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check level folders for unplayable levels")
+    parser.add_argument("paths", nargs="+", help="Level folders, folders of levels or level packs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    levels = level_paths(args.paths)
+    counts = Counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for result in pool.map(lint_level, levels, chunksize=32):
+            counts["levels"] += 1
+            counts["with_errors"] += bool(result.errors)
+            counts["with_warnings"] += bool(result.warnings)
+            print(json.dumps(asdict(result)))
+    print(json.dumps({"summary": dict(counts)}), file=sys.stderr)
+    return 1 if counts["with_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -146,14 +146,8 @@ class Player:
 	# inventory: can hold a single integer item or None
 	inventory: int | None = None
 
-	def interact(self, grid: List[List[Block]]) -> bool:
-		"""Interact with the tile the player is facing using the Space key.
-
-		- If facing a Dispenser and inventory is empty, take one item (dispenser.dispense()).
-		- If facing an Appliance and inventory has an item, place it into appliance.contents.
-
-		Returns True if an interaction modified state, False otherwise.
-		"""
+	def facing_tile(self) -> tuple[int, int]:
+		"""Return the (x, y) coordinates of the tile the player is facing."""
 		dx = dy = 0
 		if self.orientation == "up":
 			dy = -1
@@ -163,9 +157,17 @@ class Player:
 			dx = -1
 		else:
 			dx = 1
+		return self.x + dx, self.y + dy
 
-		tx = self.x + dx
-		ty = self.y + dy
+	def interact(self, grid: List[List[Block]]) -> bool:
+		"""Interact with the tile the player is facing using the Space key.
+
+		- If facing a Dispenser and inventory is empty, take one item (dispenser.dispense()).
+		- If facing an Appliance and inventory has an item, place it into appliance.contents.
+
+		Returns True if an interaction modified state, False otherwise.
+		"""
+		tx, ty = self.facing_tile()
 		if not (0 <= ty < len(grid) and 0 <= tx < len(grid[0])):
 			return False
 
@@ -0,0 +1,314 @@
+"""Recipe dependency graph of a level and a lower bound on its game time.
+
+`RecipeGraph` turns the flat operation list of a level into a graph of
+items: which items each item is made from, which appliances make it and a
+topological order (ingredients before products). From any snapshot it
+gives, per item, the earliest time the player could hold it, combining
+operation durations with walking distances between blocks, and from that
+a lower bound on the game time still needed to hold the goal.
+
+The bound is the A* heuristic of `solver.py`. On its own it is a cheap
+"gap to optimum" measure for a run, without a full search:
+
+    python recipe.py levels level_archive/level4
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import sys
+from typing import Dict, List, Tuple
+
+from game import Game  # type: ignore
+from game_utils import level_paths, quiet
+from states import GameState, Level
+
+
+class RecipeGraph:
+    """Items, operations and blocks of one level, ordered for relaxation.
+
+    Blocks are numbered like `targets`: dispensers, then appliances, then
+    tables. Operations are kept in the topological order of their products,
+    so one pass over them settles every item of an acyclic recipe; cyclic
+    recipes are relaxed until no item gets an earlier time.
+
+    Attributes:
+        targets: list[tuple[int, int]] -- interactable blocks, indexed as above
+        order: list[int] -- every item, ingredients before the items made from them
+        producers: dict[int, list[str]] -- item -> letters of the appliances that make it
+        acyclic: bool -- False when some item is (indirectly) made from itself
+    """
+
+    def __init__(self, game: Game) -> None:
+        self.game = game
+        self.goal = game.goal
+        self.targets: List[Tuple[int, int]] = (
+            game.dispenser_positions + game.appliance_positions + game.table_positions
+        )
+        self.first_appliance = len(game.dispenser_positions)
+        self.first_table = self.first_appliance + len(game.appliance_positions)
+        apart = game.distance_table()
+        self.apart = [[apart.get((src, dst), float("inf")) for dst in self.targets] for src in self.targets]
+        self._reach_cache: Dict[Tuple[int, int], List[float]] = {}
+
+        self.dispensers = []
+        items = set() if self.goal is None else {self.goal}
+        for i, (x, y) in enumerate(game.dispenser_positions):
+            blk = game.grid[y][x]
+            item = blk.dispense()
+            if item != -1:
+                self.dispensers.append((i, item, blk.dispenser_time))
+                items.add(item)
+        self.products: Dict[int, List[int]] = {}
+        self.producers: Dict[int, List[str]] = {}
+        operations = []
+        for i, (x, y) in enumerate(game.appliance_positions, self.first_appliance):
+            blk = game.grid[y][x]
+            self.products[i] = [op.product for op in blk.operations]
+            for op in blk.operations:
+                operations.append((i, tuple(op.ingredients), op.product, op.time))
+                letters = self.producers.setdefault(op.product, [])
+                if blk.id not in letters:
+                    letters.append(blk.id)
+                items.update(op.ingredients)
+                items.add(op.product)
+        for letters in self.producers.values():
+            letters.sort()
+
+        self.order, self.acyclic = self._topological_order(items, operations)
+        position = {item: n for n, item in enumerate(self.order)}
+        self.operations = sorted(operations, key=lambda op: position[op[2]])
+
+    @staticmethod
+    def _topological_order(items: set, operations: list) -> Tuple[List[int], bool]:
+        """Kahn's algorithm on ingredient -> product edges, smallest item first.
+
+        Items on a cycle (and everything made from them) go last, in id order.
+        """
+        edges: Dict[int, set] = {item: set() for item in items}
+        for _, ingredients, product, _ in operations:
+            for item in ingredients:
+                edges[item].add(product)
+        indegree = dict.fromkeys(items, 0)
+        for products in edges.values():
+            for product in products:
+                indegree[product] += 1
+        heap = [item for item, n in indegree.items() if n == 0]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            item = heapq.heappop(heap)
+            order.append(item)
+            for product in edges[item]:
+                indegree[product] -= 1
+                if indegree[product] == 0:
+                    heapq.heappush(heap, product)
+        acyclic = len(order) == len(items)
+        if not acyclic:
+            placed = set(order)
+            order.extend(sorted(items - placed))
+        return order, acyclic
+
+    def reach_from(self, pos: Tuple[int, int]) -> List[float]:
+        """Steps from `pos` to next to every target (infinity if unreachable)."""
+        reach = self._reach_cache.get(pos)
+        if reach is None:
+            reach = []
+            for target in self.targets:
+                dist, _ = self.game.find_route(pos, target)
+                reach.append(float("inf") if dist == -1 else dist)
+            self._reach_cache[pos] = reach
+        return reach
+
+    def earliest_times(self, state: GameState) -> Dict[int, float]:
+        """Earliest time after `state` the player could hold each item.
+
+        Items that can no longer be obtained are left out.
+        """
+        ready, _ = self._ready(state, self.reach_from(state.player[:2]))
+        times = {}
+        if state.inventory is not None:
+            times[state.inventory] = 0
+        for item, spots in ready.items():
+            times[item] = min(times.get(item, float("inf")), min(spots.values()))
+        return times
+
+    def lower_bound(self, state: GameState) -> float:
+        """Lower bound on the game time still needed to hold the goal.
+
+        Every item gets, per block, the earliest time the player could hold
+        it there: from a table, an appliance or a live dispenser, or by
+        running an operation once each ingredient could have been carried
+        to the appliance, one trip per ingredient. Waiting, detours and
+        competition for appliances are ignored, so the bound never
+        overestimates. Returns infinity when the goal can no longer be
+        produced.
+        """
+        if state.inventory == self.goal:
+            return 0
+        inf = float("inf")
+        reach = self.reach_from(state.player[:2])
+        ready, stock = self._ready(state, reach)
+        earliest = min(ready.get(self.goal, {}).values(), default=inf)
+        if earliest == inf:
+            return inf
+        return max(earliest, self._carry_bound(state, reach, stock))
+
+    def _ready(self, state: GameState, reach: List[float]) -> Tuple[Dict[int, Dict[int, float]], Dict[int, List[int]]]:
+        """Per item, earliest time it can be held at each block, and the blocks holding it now."""
+        inf = float("inf")
+        apart = self.apart
+        inventory = state.inventory
+        # item -> {target index: earliest time the player can hold it there}
+        ready: Dict[int, Dict[int, float]] = {}
+
+        def offer(item: int, where: int, t: float) -> bool:
+            spots = ready.setdefault(item, {})
+            if t < spots.get(where, inf):
+                spots[where] = t
+                return True
+            return False
+
+        for i, item, expiry in self.dispensers:
+            if expiry == -1 or state.dispensers[i] + reach[i] < expiry:
+                offer(item, i, reach[i])
+        for i, item in enumerate(state.tables, self.first_table):
+            if item is not None:
+                offer(item, i, reach[i])
+        for i, (contents, op_index, remaining, _) in enumerate(state.appliances, self.first_appliance):
+            for item in contents:
+                offer(item, i, reach[i])
+            if op_index != -1:
+                offer(self.products[i][op_index], i, max(reach[i], remaining))
+
+        # blocks holding each item right now, before any operation runs
+        stock = {item: list(spots) for item, spots in ready.items()}
+
+        changed = True
+        while changed:
+            changed = False
+            for i, ingredients, product, duration in self.operations:
+                contents = state.appliances[i - self.first_appliance][0]
+                start = reach[i]
+                first = inf
+                trips = 0
+                longest = 0
+                for item in ingredients:
+                    if item in contents:
+                        continue
+                    arrival = reach[i] if item == inventory else inf
+                    trip = 0 if item == inventory else inf
+                    for src, t in ready.get(item, {}).items():
+                        arrival = min(arrival, t + apart[src][i])
+                        trip = min(trip, apart[i][src] + apart[src][i])
+                    start = max(start, arrival)
+                    first = min(first, arrival)
+                    trips += trip
+                    longest = max(longest, trip)
+                if first < inf:
+                    # one item is carried at a time: after the first delivery
+                    # every other ingredient needs its own trip out and back
+                    start = max(start, first + trips - longest)
+                if start < inf and offer(product, i, start + duration):
+                    changed = True
+            # in topological order one pass settles every item
+            changed = changed and not self.acyclic
+        return ready, stock
+
+    def _carry_bound(self, state: GameState, reach: List[float], stock: Dict[int, List[int]]) -> float:
+        """Lower bound on the walking done while carrying ingredients.
+
+        With a single inventory slot, carrying one ingredient to its
+        appliance never overlaps with carrying another, so the cheapest set
+        of deliveries that still produces the goal bounds the remaining time
+        on its own, independently of how long the operations take.
+        """
+        inf = float("inf")
+        apart = self.apart
+        inventory = state.inventory
+        # (item, appliance index) -> carrying needed to have it made there
+        made: Dict[Tuple[int, int], float] = {}
+        for i, (_, op_index, _, _) in enumerate(state.appliances, self.first_appliance):
+            if op_index != -1:
+                made[(self.products[i][op_index], i)] = 0
+
+        def carry(item: int, where: int) -> float:
+            best = reach[where] if item == inventory else inf
+            for src in stock.get(item, ()):
+                best = min(best, apart[src][where])
+            for (product, src), cost in made.items():
+                if product == item:
+                    best = min(best, cost + apart[src][where])
+            return best
+
+        changed = True
+        while changed:
+            changed = False
+            for i, ingredients, product, _ in self.operations:
+                contents = state.appliances[i - self.first_appliance][0]
+                cost = 0
+                for item in ingredients:
+                    if item not in contents:
+                        cost += carry(item, i)
+                if cost < made.get((product, i), inf):
+                    made[(product, i)] = cost
+                    changed = True
+            changed = changed and not self.acyclic
+
+        if self.goal in stock:
+            return 0
+        return min((cost for (product, _), cost in made.items() if product == self.goal), default=inf)
+
+
+def start_graph(level: Level) -> Tuple[RecipeGraph, GameState]:
+    """Recipe graph of `level` and the snapshot it starts from."""
+    with quiet():
+        game = Game.from_level(level)
+        player = game.spawn_player()
+        start = game.snapshot(player)
+    return RecipeGraph(game), start
+
+
+def level_lower_bound(level: Level) -> float | None:
+    """Lower bound on the game time to finish `level` from its start.
+
+    None when the level has no goal; infinity when the goal cannot be made.
+    """
+    if level.goal is None:
+        return None
+    graph, start = start_graph(level)
+    return graph.lower_bound(start)
+
+
+def load_bounds(levels: List[str]) -> Dict[str, float | None]:
+    """Lower bound on the game time per level path (see `level_lower_bound`)."""
+    return {level: level_lower_bound(Level.load_from_folder(level)) for level in levels}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Recipe order and game time lower bound of levels")
+    parser.add_argument("paths", nargs="+", help="Level folders, folders of levels or level packs")
+    args = parser.parse_args()
+
+    for path in level_paths(args.paths):
+        level = Level.load_from_folder(path)
+        if level.goal is None:
+            print(json.dumps({"level": path, "lower_bound": None}))
+            continue
+        graph, start = start_graph(level)
+        earliest = graph.earliest_times(start)
+        bound = graph.lower_bound(start)
+        print(json.dumps({
+            "level": path,
+            "order": graph.order,
+            "producers": {str(item): graph.producers[item] for item in graph.order if item in graph.producers},
+            "earliest": {str(item): earliest[item] for item in graph.order if item in earliest},
+            "lower_bound": None if bound == float("inf") else bound,
+        }))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
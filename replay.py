@@ -0,0 +1,121 @@
+"""Replay recorded command logs against a level at full speed.
+
+A `CommandLog` (see states.py) is written by `Game.run_text` /
+`Game.run_pygame` when recording is enabled, e.g. with
+`python -m game levels --record logs` or `benchmark.py --record logs`. `replay` re-executes it with
+no input, no printing and no rendering, and reports the final game time
+and progress together with the first step whose state hash differs from
+the recorded one. Optionally the tile-by-tile trajectory of the player is
+reconstructed as well.
+
+Usage:
+    python replay.py logs/*.log
+    python replay.py --trajectory logs/run.log
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from game import INTERACT_RE, Game  # type: ignore
+from game_utils import quiet
+from states import CommandLog, Level
+
+# outcomes of Game.apply_command that end the level
+_TERMINAL = ("goal", "exit", "repeat", "continue", "level_skip")
+
+
+@dataclass
+class ReplayResult:
+    """Summary of one replayed log.
+
+    Attributes:
+        level: str -- level folder the log was recorded on
+        steps: int -- number of commands executed
+        game_time: int -- final player game time
+        progress: list[int] -- first time each item id was obtained
+        completed: bool -- whether the goal was reached
+        divergence: int | None -- index of the first step whose state hash
+            differs from the log (None when the replay matches)
+        trajectory: list[tuple[int, int]] | None -- player tile after every
+            step walked, spawn first (only when requested)
+    """
+
+    level: str
+    steps: int
+    game_time: int
+    progress: List[int]
+    completed: bool
+    divergence: Optional[int] = None
+    trajectory: Optional[List[Tuple[int, int]]] = None
+
+
+def replay(
+    log: CommandLog, level: Level | None = None, verify: bool = True, trajectory: bool = False
+) -> ReplayResult:
+    """Execute `log` on a fresh game and report the outcome.
+
+    `level` defaults to loading `log.level`. With `verify`, the state after
+    every step is hashed and compared with the recorded hash. With
+    `trajectory`, the tiles walked by pathfinding commands are filled in from
+    the game's route paths, so every entry is one step from the previous one.
+    """
+    if level is None:
+        level = Level.load_from_folder(log.level)
+    divergence = None
+    completed = False
+    steps = 0
+    with quiet():
+        game = Game.from_level(level)
+        player = game.spawn_player()
+        tiles = [(player.x, player.y)] if trajectory else None
+        for command, expected in log.entries:
+            start = (player.x, player.y)
+            outcome = game.apply_command(player, command, log.pathfinding)
+            steps += 1
+            if tiles is not None and (player.x, player.y) != start:
+                nav = INTERACT_RE.match(command) if log.pathfinding else None
+                if nav:
+                    tiles.extend(game.iter_route(start, (int(nav.group(1)), int(nav.group(2)))))
+                else:
+                    tiles.append((player.x, player.y))
+            if verify and divergence is None and game.snapshot(player).digest() != expected:
+                divergence = steps - 1
+            if outcome in _TERMINAL:
+                completed = outcome == "goal"
+                break
+    return ReplayResult(
+        level=log.level,
+        steps=steps,
+        game_time=player.game_time,
+        progress=list(game.progress),
+        completed=completed,
+        divergence=divergence,
+        trajectory=tiles,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded command logs")
+    parser.add_argument("logs", nargs="+", help="Command log files")
+    parser.add_argument("--no-verify", action="store_true", help="Skip state hash comparison")
+    parser.add_argument("--trajectory", action="store_true", help="Include the tiles walked by the player")
+    args = parser.parse_args()
+
+    diverged = 0
+    for path in args.logs:
+        result = replay(CommandLog.load(path), verify=not args.no_verify, trajectory=args.trajectory)
+        if result.divergence is not None:
+            diverged += 1
+        print(json.dumps({"log": str(Path(path)), **asdict(result)}))
+    print(f"{len(args.logs)} logs replayed, {diverged} diverged", file=sys.stderr)
+    return 1 if diverged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""Optimal-plan solver for cookenv levels.
+
+Searches the space of pathfinding-control commands (`interact (x,y)` and
+`drop`) with A* on game time and returns the smallest game time
+at which the goal item can be held, together with a plan that reaches it.
+Transitions are produced by the real game rules (`Game.apply_command` on a
+restored snapshot), so the result is exact for the text-mode game.
+
+Results are cached on disk by level content (see `cached_solve`).
+
+Usage:
+    python solver.py levels/level1 levels/level3
+    python solver.py --no-cache levels/level2
+    python solver.py packs/generated.zip
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from game import Game  # type: ignore
+from game_utils import list_levels_dir, quiet
+from recipe import RecipeGraph
+from states import LEVEL_PACK_SUFFIX, GameState, Level, read_level_file
+
+# solved levels are stored here as <level_hash>.json, next to this module so
+# that runs from any working directory share them
+CACHE_DIR = Path(__file__).resolve().with_name(".solver_cache")
+# bump when a change to the search can alter cached results
+SOLVER_VERSION = 1
+
+
+@dataclass
+class SolveResult:
+    """Outcome of `solve`.
+
+    Attributes:
+        level: str -- level folder that was solved
+        status: str -- "optimal", "unsolvable" or "limit" (search budget hit)
+        optimal_time: int | None -- minimal game time to hold the goal item
+        plan: list[str] -- commands reaching the goal in `optimal_time`
+        expanded: int -- states taken off the open list
+        generated: int -- successor states produced
+        seconds: float -- wall-clock search time
+    """
+
+    level: str
+    status: str
+    optimal_time: Optional[int] = None
+    plan: List[str] = field(default_factory=list)
+    expanded: int = 0
+    generated: int = 0
+    seconds: float = 0.0
+
+
+def normalized_score(optimal_time: int | None, achieved_time: int | None) -> float:
+    """Optimal / achieved game time: 1.0 for an optimal run, 0.0 for a failed one."""
+    if optimal_time is None or achieved_time is None or achieved_time <= 0:
+        return 0.0
+    return min(1.0, optimal_time / achieved_time)
+
+
+def _layout(state: GameState) -> tuple:
+    """Where the items are: inventory, appliance contents and operations, tables."""
+    return state.inventory, tuple(a[:2] for a in state.appliances), state.tables
+
+
+def _state_key(state: GameState) -> tuple:
+    """Part of a snapshot that decides the future of the level.
+
+    Game time is the search cost; orientation, progress and operation start
+    times only affect bookkeeping, not which commands succeed.
+    """
+    return (
+        state.player[:2],
+        state.inventory,
+        tuple(a[:3] for a in state.appliances),
+        state.dispensers,
+        state.tables,
+    )
+
+
+class Solver:
+    """A* search over the commands of one level.
+
+    States are deduplicated on everything but game time and reopened when
+    reached faster. The heuristic never overestimates the remaining game
+    time, so the first goal state taken off the open list is optimal.
+    """
+
+    def __init__(self, level: Level) -> None:
+        self.level = level
+        with quiet():
+            self.game = Game.from_level(level)
+        self.player = self.game.spawn_player()
+        self.goal = self.game.goal
+        self.recipe = RecipeGraph(self.game)
+        self.targets: List[Tuple[int, int]] = self.recipe.targets
+        self.commands = [f"interact ({x},{y})" for x, y in self.targets]
+
+    def heuristic(self, state: GameState) -> float:
+        """Lower bound on the game time still needed to hold the goal.
+
+        See `RecipeGraph.lower_bound`; infinity when the goal can no longer
+        be produced.
+        """
+        return self.recipe.lower_bound(state)
+
+    def _successors(self, state: GameState) -> List[Tuple[str, GameState, bool]]:
+        game, player = self.game, self.player
+        commands = list(self.commands)
+        if state.inventory is not None:
+            commands.append("drop")
+        before = _layout(state)
+        out = []
+        for cmd in commands:
+            game.restore(state, player)
+            outcome = game.apply_command(player, cmd)
+            child = game.snapshot(player)
+            # a command that changed no item only spent time walking or
+            # waiting, which never lets a later command finish sooner
+            if outcome != "goal" and _layout(child) == before:
+                continue
+            out.append((cmd, child, outcome == "goal"))
+        return out
+
+    def solve(self, max_expansions: int | None = None) -> SolveResult:
+        """Run A* from the level start and return the optimal plan."""
+        started = time.perf_counter()
+        result = SolveResult(level=str(self.level.path), status="unsolvable")
+        if self.goal is None:
+            result.seconds = time.perf_counter() - started
+            return result
+
+        start = self.game.snapshot(self.player)
+        counter = itertools.count()
+        start_key = _state_key(start)
+        open_list = [(self.heuristic(start), -start.game_time, next(counter), start_key, start, False)]
+        parents: Dict[tuple, Tuple[tuple | None, str | None]] = {start_key: (None, None)}
+        best_time: Dict[tuple, int] = {start_key: start.game_time}
+
+        with quiet():
+            while open_list:
+                _, _, _, key, state, reached = heapq.heappop(open_list)
+                if state.game_time > best_time[key]:
+                    # superseded by a faster way to the same state
+                    continue
+                if reached:
+                    result.status = "optimal"
+                    result.optimal_time = state.game_time
+                    result.plan = self._plan(parents, key)
+                    break
+                result.expanded += 1
+                if max_expansions is not None and result.expanded > max_expansions:
+                    result.status = "limit"
+                    break
+                for cmd, child, child_reached in self._successors(state):
+                    result.generated += 1
+                    child_key = _state_key(child)
+                    if child_reached:
+                        # a goal state is terminal; keep it apart from the same layout without the win
+                        child_key = ("goal",) + child_key
+                    if best_time.get(child_key, child.game_time + 1) <= child.game_time:
+                        continue
+                    best_time[child_key] = child.game_time
+                    parents[child_key] = (key, cmd)
+                    h = 0 if child_reached else self.heuristic(child)
+                    if h == float("inf"):
+                        # the goal can no longer be produced from here
+                        continue
+                    heapq.heappush(open_list, (child.game_time + h, -child.game_time, next(counter), child_key, child, child_reached))
+        result.seconds = time.perf_counter() - started
+        return result
+
+    @staticmethod
+    def _plan(parents: Dict[tuple, Tuple[tuple | None, str | None]], key: tuple) -> List[str]:
+        plan = []
+        while True:
+            parent, cmd = parents[key]
+            if cmd is None:
+                break
+            plan.append(cmd)
+            key = parent
+        plan.reverse()
+        return plan
+
+
+def solve(level: Level | str | Path, max_expansions: int | None = None) -> SolveResult:
+    """Compute the optimal completion time and plan for `level`."""
+    if not isinstance(level, Level):
+        level = Level.load_from_folder(level)
+    return Solver(level).solve(max_expansions)
+
+
+def level_hash(level: Level | str | Path) -> str:
+    """Hash of a level's maze.txt and recipe.txt (plus the solver version)."""
+    folder = Path(level.path if isinstance(level, Level) else level)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"solver-v{SOLVER_VERSION}".encode("utf-8"))
+    for name in ("maze.txt", "recipe.txt"):
+        data = read_level_file(folder, name)
+        if data is None:
+            raise FileNotFoundError(f"{folder / name} not found")
+        h.update(b"\0")
+        h.update(data)
+    return h.hexdigest()
+
+
+def load_cached(level: Level | str | Path, cache_dir: str | Path = CACHE_DIR) -> SolveResult | None:
+    """Return the cached result for `level`, or None if it was never solved.
+
+    Entries are keyed by `level_hash`, so editing the level files makes the
+    old entry unreachable.
+    """
+    path = Path(cache_dir) / f"{level_hash(level)}.json"
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return SolveResult(**data)
+    except (ValueError, TypeError):
+        # unreadable or written by an incompatible version: solve again
+        return None
+
+
+def cached_solve(
+    level: Level | str | Path, max_expansions: int | None = None, cache_dir: str | Path = CACHE_DIR
+) -> SolveResult:
+    """`solve` with results stored on disk under `cache_dir`.
+
+    A cached "limit" result is reused only when it searched at least as far
+    as `max_expansions` allows now.
+    """
+    cached = load_cached(level, cache_dir)
+    if cached is not None:
+        if cached.status != "limit" or (max_expansions is not None and cached.expanded > max_expansions):
+            return cached
+    result = solve(level, max_expansions)
+    path = Path(cache_dir) / f"{level_hash(level)}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(asdict(result)), encoding="utf-8")
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compute optimal plans for cookenv levels")
+    parser.add_argument("levels", nargs="+", help="Level folders or level packs (every level in the pack)")
+    parser.add_argument("--max-expansions", type=int, default=None, help="Give up after this many expanded states")
+    parser.add_argument("--cache-dir", type=str, default=str(CACHE_DIR), help="Directory for cached results")
+    parser.add_argument("--no-cache", action="store_true", help="Always search, ignoring the cache")
+    args = parser.parse_args()
+
+    folders = []
+    for path in args.levels:
+        folders.extend(list_levels_dir(path) if path.endswith(LEVEL_PACK_SUFFIX) else [path])
+    for folder in folders:
+        if args.no_cache:
+            result = solve(folder, args.max_expansions)
+        else:
+            result = cached_solve(folder, args.max_expansions, args.cache_dir)
+        print(json.dumps(asdict(result)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
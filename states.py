@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List
 from pathlib import Path
 from typing import Dict, Optional
+import hashlib
+import io
+import json
+import marshal
+import os
 import re
+import zipfile
 
 
 @dataclass
@@ -31,6 +37,141 @@ class DispenserTimeLimit:
     expTime: int
 
 
+@dataclass(frozen=True)
+class GameState:
+    """Immutable snapshot of everything that changes while a level is played.
+
+    The static map, operations and mapping are not part of the snapshot;
+    they stay shared with the Game it was taken from. Per-block tuples are
+    ordered like `Game.appliance_positions`, `dispenser_positions` and
+    `table_positions`.
+
+    Attributes:
+        player: tuple -- (x, y, orientation)
+        inventory: int | None -- item held by the player
+        game_time: int -- player game time
+        clock: int -- game clock the block timers are relative to
+        progress: tuple[int, ...] -- first time each item id was obtained
+        appliances: tuple -- (contents, operation index or -1, remaining_time, op_start_time) per appliance
+        dispensers: tuple[int, ...] -- elapsed time per dispenser
+        tables: tuple -- item id (or None) per table
+    """
+
+    player: tuple[int, int, str]
+    inventory: Optional[int]
+    game_time: int
+    clock: int
+    progress: tuple[int, ...]
+    appliances: tuple[tuple[tuple[int, ...], int, int, Optional[int]], ...]
+    dispensers: tuple[int, ...]
+    tables: tuple[Optional[int], ...]
+
+    def digest(self) -> str:
+        """Short, stable hash of the snapshot (16 hex chars)."""
+        return hashlib.blake2b(repr(self).encode("utf-8"), digest_size=8).hexdigest()
+
+
+@dataclass
+class CommandLog:
+    """Commands issued while playing one level, with the state hash after each.
+
+    Saved as a JSON header line followed by one `<hash> <command>` line per
+    step, so logs stay small and can be diffed.
+
+    Attributes:
+        level: str -- path of the level folder that was played
+        pathfinding: bool -- whether the commands use the pathfinding controls
+        entries: list[tuple[str, str]] -- (command, state digest) per step
+    """
+
+    level: str
+    pathfinding: bool = True
+    entries: List[tuple[str, str]] = field(default_factory=list)
+
+    def record(self, command: str, state: GameState) -> None:
+        self.entries.append((command, state.digest()))
+
+    def save(self, path: str | Path) -> None:
+        header = json.dumps({"level": self.level, "pathfinding": self.pathfinding})
+        lines = [header] + [f"{digest} {command}" for command, digest in self.entries]
+        Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path) -> "CommandLog":
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+        if not lines:
+            raise RuntimeError(f"Empty command log {path}")
+        header = json.loads(lines[0])
+        entries = []
+        for line in lines[1:]:
+            if not line.strip():
+                continue
+            digest, _, command = line.partition(" ")
+            entries.append((command, digest))
+        return cls(level=header["level"], pathfinding=header.get("pathfinding", True), entries=entries)
+
+
+# compiled copy of a parsed level, written next to its text files
+LEVEL_CACHE_NAME = ".level.cache"
+# bump when the parser or the cache layout changes
+LEVEL_CACHE_VERSION = 1
+_LEVEL_FILES = ("desc.txt", "mapping.txt", "maze.txt", "recipe.txt")
+# many levels in one zip file, one folder per level (see LevelPack)
+LEVEL_PACK_SUFFIX = ".zip"
+
+
+def _decode(data: bytes) -> str:
+    """Decode a level file like `open(..., encoding="utf-8")` would (universal newlines)."""
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8").read()
+
+
+def split_pack_path(path: str | Path) -> tuple[Path, str] | None:
+    """(pack file, level name) when `path` points at a level inside a pack.
+
+    Levels in a pack are addressed as `<pack>.zip/<level>`, e.g.
+    `packs/generated.zip/level00042`.
+    """
+    p = Path(path)
+    for parent in p.parents:
+        if parent.suffix == LEVEL_PACK_SUFFIX and parent.is_file():
+            return parent, p.relative_to(parent).as_posix()
+    return None
+
+
+def read_level_file(folder: str | Path, name: str) -> bytes | None:
+    """Raw contents of file `name` of a level folder or pack level, None if missing."""
+    packed = split_pack_path(folder)
+    if packed is not None:
+        pack_path, level = packed
+        return open_pack(pack_path).read(level, name)
+    f = Path(folder) / name
+    return f.read_bytes() if f.exists() else None
+
+
+def _source_stats(folder: Path) -> list:
+    """(mtime_ns, size) of each level file, None for missing ones."""
+    stats = []
+    for name in _LEVEL_FILES:
+        try:
+            st = (folder / name).stat()
+        except OSError:
+            stats.append(None)
+            continue
+        stats.append((st.st_mtime_ns, st.st_size))
+    return stats
+
+
+def _source_digest(folder: Path) -> str:
+    """Hash of the contents of the level files."""
+    h = hashlib.blake2b(digest_size=16)
+    for name in _LEVEL_FILES:
+        f = folder / name
+        data = f.read_bytes() if f.exists() else b""
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+
 @dataclass
 class Level:
     """Container for level files and parsed content.
@@ -40,6 +181,11 @@ class Level:
     - mapping.txt    : mapping of item/appliance ids to human names
     - maze.txt       : textual map (with start marker ^ v < >)
     - recipe.txt     : operations and goal
+
+    The parsed level is kept in `.level.cache` inside the folder and reused
+    while the text files are unchanged (same mtimes, or same contents).
+    `compiled` holds the tile codes of the maze (see `tilemap.compile_tiles`),
+    or None when the maze does not compile.
     """
 
     path: Path
@@ -50,106 +196,207 @@ class Level:
     goal: Optional[int]
     start_pos: tuple[int, int] | None = None
     start_orientation: str | None = None
-    
+    compiled: tuple[int, bytes, tuple[tuple[int, int, str], ...]] | None = None
+
     @classmethod
-    def load_from_folder(cls, folder: str | Path) -> "Level":
+    def load_from_folder(cls, folder: str | Path, use_cache: bool = True) -> "Level":
         p = Path(folder)
+        if not p.exists():
+            packed = split_pack_path(p)
+            if packed is not None:
+                return open_pack(packed[0]).load(packed[1])
         if not p.exists() or not p.is_dir():
             raise FileNotFoundError(f"Level folder not found: {p}")
+        if not use_cache:
+            return cls._parse_folder(p)
 
-        desc_file = p / "desc.txt"
-        map_file = p / "mapping.txt"
-        maze_file = p / "maze.txt"
-        recipe_file = p / "recipe.txt"
+        stats = _source_stats(p)
+        cached = cls._load_cache(p, stats)
+        if cached is not None:
+            return cached
+        level = cls._parse_folder(p)
+        level._save_cache(stats, _source_digest(p))
+        return level
+
+    @classmethod
+    def _load_cache(cls, p: Path, stats: list) -> "Level | None":
+        """The cached level of folder `p`, or None if missing or stale."""
+        try:
+            data = marshal.loads((p / LEVEL_CACHE_NAME).read_bytes())
+            if data["version"] != LEVEL_CACHE_VERSION:
+                return None
+            if data["stats"] != stats:
+                # touched but maybe not edited (e.g. a fresh checkout)
+                if data["digest"] != _source_digest(p):
+                    return None
+            fields = data["level"]
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            return None
+        ops: List[Operation | DispenserTimeLimit] = [
+            Operation(list(op[1]), op[2], op[3], op[4]) if op[0] == "op" else DispenserTimeLimit(op[1], op[2])
+            for op in fields["operations"]
+        ]
+        level = cls(
+            path=p,
+            desc=fields["desc"],
+            mapping=fields["mapping"],
+            maze_lines=fields["maze_lines"],
+            operations=ops,
+            goal=fields["goal"],
+            start_pos=fields["start_pos"],
+            start_orientation=fields["start_orientation"],
+            compiled=fields["compiled"],
+        )
+        if data["stats"] != stats:
+            level._save_cache(stats, data["digest"])
+        return level
 
-        if not maze_file.exists() or not recipe_file.exists():
+    def _save_cache(self, stats: list, digest: str) -> None:
+        """Write `.level.cache`; read-only level folders are left alone."""
+        ops = [
+            ("op", tuple(op.ingredients), op.appliance, op.product, op.time) if isinstance(op, Operation)
+            else ("limit", op.dispenser, op.expTime)
+            for op in self.operations
+        ]
+        data = {
+            "version": LEVEL_CACHE_VERSION,
+            "stats": stats,
+            "digest": digest,
+            "level": {
+                "desc": self.desc,
+                "mapping": self.mapping,
+                "maze_lines": self.maze_lines,
+                "operations": ops,
+                "goal": self.goal,
+                "start_pos": self.start_pos,
+                "start_orientation": self.start_orientation,
+                "compiled": self.compiled,
+            },
+        }
+        target = self.path / LEVEL_CACHE_NAME
+        tmp = target.with_name(f"{LEVEL_CACHE_NAME}.{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(marshal.dumps(data))
+            os.replace(tmp, target)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    @classmethod
+    def from_files(cls, path: str | Path, files: Dict[str, str]) -> "Level":
+        """Parse a level from file contents held in memory (file name -> text)."""
+        return cls._parse(Path(path), lambda name: files[name].encode("utf-8") if name in files else None)
+
+    @classmethod
+    def _parse_folder(cls, p: Path) -> "Level":
+        def read(name: str) -> bytes | None:
+            f = p / name
+            return f.read_bytes() if f.exists() else None
+
+        return cls._parse(p, read)
+
+    @classmethod
+    def _parse(cls, p: Path, read) -> "Level":
+        """Parse a level whose files are returned (as bytes, None if missing) by `read(name)`."""
+        recipe_file = p / "recipe.txt"
+        maze_data = read("maze.txt")
+        recipe_data = read("recipe.txt")
+        if maze_data is None or recipe_data is None:
             raise FileNotFoundError("Level must contain maze.txt and recipe.txt")
 
         # read description
         desc = ""
-        if desc_file.exists():
-            try:
-                desc = desc_file.read_text(encoding="utf-8")
-            except Exception:
-                desc = ""
+        try:
+            data = read("desc.txt")
+            if data is not None:
+                desc = _decode(data)
+        except Exception:
+            desc = ""
 
         # read mapping (simple key = value lines)
         mapping: Dict[str, str] = {}
-        if map_file.exists():
-            try:
-                for raw in map_file.read_text(encoding="utf-8").splitlines():
+        try:
+            data = read("mapping.txt")
+            if data is not None:
+                for raw in _decode(data).splitlines():
                     line = raw.strip()
                     if not line or line.startswith("#"):
                         continue
                     if "=" in line:
                         k, v = line.split("=", 1)
                         mapping[k.strip()] = v.strip()
-            except Exception:
-                mapping = {}
+        except Exception:
+            mapping = {}
 
         # read maze and detect start marker
         maze_lines: List[str] = []
         start_pos = None
         start_orientation = None
         markers = {"^": "up", "v": "down", "<": "left", ">": "right"}
-        with maze_file.open("r", encoding="utf-8") as fh:
-            for y, raw in enumerate(fh.readlines()):
-                row = raw.rstrip("\n")
-                for idx, ch in enumerate(row):
-                    if ch in markers and start_pos is None:
-                        start_pos = (idx, y)
-                        start_orientation = markers[ch]
-                        row = row[:idx] + "." + row[idx+1:]
-                        break
-                maze_lines.append(row)
+        for y, raw in enumerate(io.StringIO(_decode(maze_data)).readlines()):
+            row = raw.rstrip("\n")
+            for idx, ch in enumerate(row):
+                if ch in markers and start_pos is None:
+                    start_pos = (idx, y)
+                    start_orientation = markers[ch]
+                    row = row[:idx] + "." + row[idx+1:]
+                    break
+            maze_lines.append(row)
 
         # parse recipe file into operations and goal
         ops: List[Operation|DispenserTimeLimit] = []
         goal: Optional[int] = None
-        with recipe_file.open("r", encoding="utf-8") as fh:
-            for raw in fh.readlines():
-                line = raw.strip()
-                if not line:
-                    continue
-                if line.lower().startswith("goal:"):
-                    try:
-                        goal = int(line.split(":", 1)[1].strip())
-                    except Exception:
-                        goal = None
-                    continue
-                if "->" in line:
-                    left, right = line.split("->", 1)
-                    ingredients = [int(s.strip()) for s in left.split(",") if s.strip()]
-                    right = right.strip()
-                    m = re.match(r"^([A-Za-z])\s*=\s*(\d+)\s*\((\d+)\)$", right)
-                    if not m:
-                        parts = right.split("=")
-                        if len(parts) >= 2:
-                            app = parts[0].strip()
-                            prod_part = parts[1].strip()
-                            try:
-                                prod = int(prod_part.split("(")[0].strip())
-                                time = int(prod_part.split("(")[1].rstrip(")").strip())
-                            except Exception:
-                                raise RuntimeError(f"Incorrect recipte file format {recipe_file}. Line {line}")
-                        else:
-                            continue
+        for raw in io.StringIO(_decode(recipe_data)).readlines():
+            line = raw.strip()
+            if not line:
+                continue
+            if line.lower().startswith("goal:"):
+                try:
+                    goal = int(line.split(":", 1)[1].strip())
+                except Exception:
+                    goal = None
+                continue
+            if "->" in line:
+                left, right = line.split("->", 1)
+                ingredients = [int(s.strip()) for s in left.split(",") if s.strip()]
+                right = right.strip()
+                m = re.match(r"^([A-Za-z])\s*=\s*(\d+)\s*\((\d+)\)$", right)
+                if not m:
+                    parts = right.split("=")
+                    if len(parts) >= 2:
+                        app = parts[0].strip()
+                        prod_part = parts[1].strip()
+                        try:
+                            prod = int(prod_part.split("(")[0].strip())
+                            time = int(prod_part.split("(")[1].rstrip(")").strip())
+                        except Exception:
+                            raise RuntimeError(f"Incorrect recipte file format {recipe_file}. Line {line}")
                     else:
-                        app = m.group(1)
-                        prod = int(m.group(2))
-                        time = int(m.group(3))
-                    ops.append(Operation(ingredients, app, prod, time))
-                if "!" in line:
-                    disp, time = line.split("!", 1)
-                    disp= disp.strip()
-                    time=time.strip()
-                    if not disp.isdigit() or not time.isdigit():
-                        raise RuntimeError(f"Incorrect recipte file format {recipe_file}. Line {line}")
-                    ops.append(DispenserTimeLimit(int(disp),int(time)))
-                    
-                    
-
-        return cls(path=p, desc=desc, mapping=mapping, maze_lines=maze_lines, operations=ops, goal=goal, start_pos=start_pos, start_orientation=start_orientation)
+                        continue
+                else:
+                    app = m.group(1)
+                    prod = int(m.group(2))
+                    time = int(m.group(3))
+                ops.append(Operation(ingredients, app, prod, time))
+            if "!" in line:
+                disp, time = line.split("!", 1)
+                disp= disp.strip()
+                time=time.strip()
+                if not disp.isdigit() or not time.isdigit():
+                    raise RuntimeError(f"Incorrect recipte file format {recipe_file}. Line {line}")
+                ops.append(DispenserTimeLimit(int(disp),int(time)))
+                
+                
+
+        # validated here so cached loads skip it; a bad maze is reported
+        # when the game is built, as before
+        from tilemap import compile_tiles
+
+        try:
+            compiled = compile_tiles(maze_lines)
+        except ValueError:
+            compiled = None
+
+        return cls(path=p, desc=desc, mapping=mapping, maze_lines=maze_lines, operations=ops, goal=goal, start_pos=start_pos, start_orientation=start_orientation, compiled=compiled)
 
     def html_info(self) -> str:
         """
@@ -161,4 +408,83 @@ class Level:
 
         
 
-        return f"<h1>{title}</h1><p>{rest_desc}<p>"
\ No newline at end of file
+        return f"<h1>{title}</h1><p>{rest_desc}<p>"
+
+class LevelPack:
+    """Many levels stored in one zip file, one folder per level.
+
+    Opening a pack reads only the zip directory; the files of a level are
+    read and parsed when it is loaded. Level paths look like
+    `<pack>.zip/<folder>` and are accepted by `Level.load_from_folder`.
+    Build one with `LevelPack.write` or any zip tool.
+
+    Attributes:
+        path: Path -- the zip file
+        names: list[str] -- level folders in the pack, sorted
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path)
+        files: Dict[str, set] = {}
+        for member in self._zip.namelist():
+            folder, _, name = member.rpartition("/")
+            if folder and name in _LEVEL_FILES:
+                files.setdefault(folder, set()).add(name)
+        self._files = files
+        self.names = sorted(folder for folder, names in files.items() if {"maze.txt", "recipe.txt"} <= names)
+
+    def level_paths(self) -> list[str]:
+        """Paths of all levels, usable wherever a level folder is."""
+        return [str(self.path / name) for name in self.names]
+
+    def read(self, level: str, name: str) -> bytes | None:
+        if name not in self._files.get(level, ()):
+            return None
+        return self._zip.read(f"{level}/{name}")
+
+    def load(self, level: str) -> Level:
+        if level not in self._files:
+            raise FileNotFoundError(f"Level {level} not found in pack {self.path}")
+        return Level._parse(self.path / level, lambda name: self.read(level, name))
+
+    def close(self) -> None:
+        self._zip.close()
+
+    @staticmethod
+    def write(path: str | Path, folders) -> int:
+        """Pack the level folders in `folders` into the zip file `path`.
+
+        Each level keeps its folder name, so names must be unique. Returns
+        the number of levels written.
+        """
+        folders = [Path(folder) for folder in folders]
+        names = [folder.name for folder in folders]
+        if len(set(names)) != len(names):
+            raise ValueError("Level folder names in a pack must be unique")
+        count = 0
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for folder in folders:
+                for name in _LEVEL_FILES:
+                    if (folder / name).exists():
+                        zf.write(folder / name, f"{folder.name}/{name}")
+                count += 1
+        return count
+
+
+# open packs by path, reopened when the file changes
+_open_packs: Dict[Path, tuple[tuple[int, int], LevelPack]] = {}
+
+
+def open_pack(path: str | Path) -> LevelPack:
+    """The LevelPack at `path`, kept open for later loads."""
+    p = Path(path)
+    st = p.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    entry = _open_packs.get(p)
+    if entry is None or entry[0] != stamp:
+        if entry is not None:
+            entry[1].close()
+        entry = (stamp, LevelPack(path))
+        _open_packs[p] = entry
+    return entry[1]
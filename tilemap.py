@@ -0,0 +1,163 @@
+"""Compact storage for the level grid.
+
+The static part of a level (walls and floor) is kept as one byte per tile;
+only stateful blocks (dispensers, appliances, tables) exist as objects, in
+a sparse table keyed by coordinates. A TileMap still supports the
+`grid[y][x]` access used throughout the game, returning shared Wall/Floor
+instances for static tiles.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from blocks import Block, Floor, Wall  # type: ignore
+
+# tile codes stored in TileMap.tiles
+WALL = 0
+FLOOR = 1
+OBJECT = 2  # look the block up in TileMap.objects
+
+# one shared instance per static block type
+_WALL = Wall()
+_FLOOR = Floor()
+_STATIC = {WALL: _WALL, FLOOR: _FLOOR}
+# tile code -> 1 if the player can stand on it
+_WALKABLE = bytes(1 if code == FLOOR else 0 for code in range(256))
+# map characters of static tiles -> tile code (as a character)
+_STATIC_CHARS = str.maketrans({"#": chr(WALL), ".": chr(FLOOR), " ": chr(FLOOR)})
+_OBJECT_CHARS = re.compile(f"[^{chr(WALL)}{chr(FLOOR)}]")
+
+
+def compile_tiles(lines: Sequence[str]) -> Tuple[int, bytes, Tuple[Tuple[int, int, str], ...]]:
+	"""Translate a text map into tile codes.
+
+	'#' is a wall, '.' and ' ' are floor; digits, letters and '*' are
+	objects. Returns the width, the row-major tile codes and (x, y, char)
+	for every object tile. Raises ValueError for an empty or ragged map
+	or an unknown character.
+	"""
+	rows = []
+	spots = []
+	width = None
+	for y, line in enumerate(lines):
+		line = line.rstrip("\n")
+		if width is None:
+			width = len(line)
+		elif len(line) != width:
+			raise ValueError("All rows in grid must have the same length")
+		row = line.translate(_STATIC_CHARS)
+		for m in _OBJECT_CHARS.finditer(row):
+			ch = line[m.start()]
+			if not (ch.isdigit() or ch.isalpha() or ch == "*"):
+				raise ValueError(f"Unrecognized map character: {ch!r}")
+			spots.append((m.start(), y, ch))
+		rows.append(_OBJECT_CHARS.sub(chr(OBJECT), row))
+	if not width:
+		raise ValueError("grid must not be empty")
+	return width, "".join(rows).encode("latin-1"), tuple(spots)
+
+
+class TileRow:
+	"""Read-only view of one row of a TileMap, indexable like a list."""
+
+	__slots__ = ("_map", "_y")
+
+	def __init__(self, tilemap: "TileMap", y: int) -> None:
+		self._map = tilemap
+		self._y = y
+
+	def __len__(self) -> int:
+		return self._map.width
+
+	def __getitem__(self, x: int) -> Block:
+		width = self._map.width
+		if x < 0:
+			x += width
+		if not 0 <= x < width:
+			raise IndexError("row index out of range")
+		return self._map.block(x, self._y)
+
+	def __iter__(self) -> Iterator[Block]:
+		m = self._map
+		start = self._y * m.width
+		for x, code in enumerate(m.tiles[start:start + m.width]):
+			if code == OBJECT:
+				yield m.objects[(x, self._y)]
+			else:
+				yield _STATIC[code]
+
+
+class TileMap:
+	"""Level grid as a byte array of tile codes plus a sparse object table.
+
+	Attributes:
+		width, height: int -- grid size in tiles
+		tiles: bytearray -- row-major tile codes (WALL, FLOOR, OBJECT)
+		objects: dict -- (x, y) -> stateful Block for every OBJECT tile
+	"""
+
+	__slots__ = ("width", "height", "tiles", "objects")
+
+	def __init__(self, width: int, height: int, tiles: bytearray, objects: Dict[Tuple[int, int], Block]) -> None:
+		if len(tiles) != width * height:
+			raise ValueError("tiles must hold width * height entries")
+		self.width = width
+		self.height = height
+		self.tiles = tiles
+		self.objects = objects
+
+	@classmethod
+	def from_blocks(cls, grid: List[List[Block]]) -> "TileMap":
+		"""Build a TileMap from a list-of-rows grid of Block instances."""
+		if not grid or not all(isinstance(r, list) for r in grid):
+			raise ValueError("grid must be a 2D list")
+		widths = {len(r) for r in grid}
+		if len(widths) != 1:
+			raise ValueError("All rows in grid must have the same length")
+		tiles = bytearray()
+		objects: Dict[Tuple[int, int], Block] = {}
+		for y, row in enumerate(grid):
+			for x, block in enumerate(row):
+				if type(block) is Floor:
+					tiles.append(FLOOR)
+				elif type(block) is Wall:
+					tiles.append(WALL)
+				else:
+					tiles.append(OBJECT)
+					objects[(x, y)] = block
+		return cls(len(grid[0]), len(grid), tiles, objects)
+
+	def block(self, x: int, y: int) -> Block:
+		code = self.tiles[y * self.width + x]
+		if code == OBJECT:
+			return self.objects[(x, y)]
+		return _STATIC[code]
+
+	def set_object(self, x: int, y: int, block: Block) -> None:
+		"""Place a stateful block on (x, y)."""
+		self.tiles[y * self.width + x] = OBJECT
+		self.objects[(x, y)] = block
+
+	def with_objects(self, objects: Dict[Tuple[int, int], Block]) -> "TileMap":
+		"""Return a TileMap sharing this static map but holding `objects`."""
+		return TileMap(self.width, self.height, self.tiles, objects)
+
+	def walkable_mask(self) -> bytearray:
+		"""One byte per tile, 1 where the player can stand."""
+		return self.tiles.translate(_WALKABLE)
+
+	def __len__(self) -> int:
+		return self.height
+
+	def __getitem__(self, y: int) -> TileRow:
+		if y < 0:
+			y += self.height
+		if not 0 <= y < self.height:
+			raise IndexError("grid index out of range")
+		return TileRow(self, y)
+
+	def __iter__(self) -> Iterator[TileRow]:
+		for y in range(self.height):
+			yield TileRow(self, y)
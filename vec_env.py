@@ -0,0 +1,365 @@
+"""Batched, array-backed environment for running many copies of a level.
+
+`VecCookEnv` holds N independent instances of one level as NumPy arrays
+and steps all of them in lockstep with a single call. Everything that
+does not depend on the instance (map, recipes, distance table) is built
+once per level and shared across the batch.
+
+Only the pathfinding controls are supported: every instance acts through
+`interact` on an interactable, `skip` or `drop`, with the same rules as
+`Game.apply_command`.
+
+Example:
+    venv = VecCookEnv("levels/level1", num_envs=1024)
+    venv.reset()
+    result = venv.step(np.full(1024, venv.encode("interact (3,1)")))
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from game import Game  # type: ignore
+from game_utils import quiet
+from states import Level
+
+# kinds of interactable blocks
+APPLIANCE = 0
+DISPENSER = 1
+TABLE = 2
+
+# appliances hold at most this many items (see Player.interact)
+MAX_CONTENTS = 4
+
+EMPTY = -1
+
+
+@dataclass
+class VecStepResult:
+    """Outcome of a `VecCookEnv.step` call; one entry per instance.
+
+    Attributes:
+        game_time: np.ndarray -- player game time, shape (N,)
+        inventory: np.ndarray -- held item id or -1, shape (N,)
+        progress: np.ndarray -- first time each item was obtained, shape (N, goal)
+        done: np.ndarray -- True once the instance reached the goal, shape (N,)
+    """
+
+    game_time: np.ndarray
+    inventory: np.ndarray
+    progress: np.ndarray
+    done: np.ndarray
+
+
+class VecCookEnv:
+    """N instances of one level stepped together.
+
+    Actions are integers: `0..num_targets-1` interacts with the matching
+    entry of `targets`, and `SKIP`, `DROP`, `NOOP` follow. `encode` turns a
+    text command into an action.
+    """
+
+    def __init__(self, level: Level | str | Path, num_envs: int) -> None:
+        if not isinstance(level, Level):
+            level = Level.load_from_folder(level)
+        self.level = level
+        self.num_envs = num_envs
+        with quiet():
+            game = Game.from_level(level)
+        self.goal = game.goal
+
+        # interactables: appliances, then dispensers, then tables (row-major within each kind)
+        self.targets: list[tuple[int, int]] = (
+            game.appliance_positions + game.dispenser_positions + game.table_positions
+        )
+        self.num_appliances = len(game.appliance_positions)
+        self.num_dispensers = len(game.dispenser_positions)
+        self.num_tables = len(game.table_positions)
+        self.target_index = {pos: i for i, pos in enumerate(self.targets)}
+        self.target_kind = np.array(
+            [APPLIANCE] * self.num_appliances + [DISPENSER] * self.num_dispensers + [TABLE] * self.num_tables,
+            dtype=np.int8,
+        )
+        self.target_local = np.array(
+            list(range(self.num_appliances)) + list(range(self.num_dispensers)) + list(range(self.num_tables)),
+            dtype=np.int64,
+        )
+        self.SKIP = len(self.targets)
+        self.DROP = self.SKIP + 1
+        self.NOOP = self.SKIP + 2
+
+        # dispensers
+        dispensers = [game.grid[y][x] for x, y in game.dispenser_positions]
+        self.dispenser_item = np.array([int(d.id) for d in dispensers], dtype=np.int64)
+        self.dispenser_expiry = np.array([d.dispenser_time for d in dispensers], dtype=np.int64)
+
+        self._compile_recipes(game)
+        self.positions, self.distance, self.approach = self._build_distance_table(game)
+        self.reset()
+
+    # --- shared, per-level tables ---
+
+    def _compile_recipes(self, game: Game) -> None:
+        """Index every appliance's operations by (appliance, sorted ingredients)."""
+        ops = []
+        items = {1}
+        for x, y in game.appliance_positions:
+            for op in game.grid[y][x].operations:
+                items.update(op.ingredients)
+                items.add(op.product)
+        items.update(int(i) for i in self.dispenser_item)
+        # slot values are item+1 (0 == empty), so keys fit in base**MAX_CONTENTS
+        self._key_base = max(items) + 2
+        self._key_span = self._key_base ** MAX_CONTENTS
+        self._key_weights = self._key_base ** np.arange(MAX_CONTENTS, dtype=np.int64)
+
+        table: dict[int, int] = {}
+        for a, (x, y) in enumerate(game.appliance_positions):
+            for op in game.grid[y][x].operations:
+                if len(op.ingredients) > MAX_CONTENTS:
+                    continue  # can never fit into the appliance
+                slots = sorted(op.ingredients) + [EMPTY] * (MAX_CONTENTS - len(op.ingredients))
+                key = a * self._key_span + self._slot_key(np.array([sorted(slots)]))[0]
+                if key not in table:  # first matching operation wins, like try_start_operations
+                    table[key] = len(ops)
+                    ops.append(op)
+        keys = sorted(table)
+        self._recipe_keys = np.array(keys, dtype=np.int64)
+        self._recipe_ops = np.array([table[k] for k in keys], dtype=np.int64)
+        self.operations = ops
+        self.op_product = np.array([op.product for op in ops], dtype=np.int64)
+        self.op_time = np.array([op.time for op in ops], dtype=np.int64)
+
+    def _slot_key(self, slots: np.ndarray) -> np.ndarray:
+        """Encode already-sorted content slots (-1 == empty) as one integer."""
+        return (slots + 1) @ self._key_weights
+
+    def _build_distance_table(self, game: Game) -> tuple[list[tuple[int, int]], np.ndarray, np.ndarray]:
+        """Distances from every reachable standing tile to every interactable.
+
+        The player only ever stands on its start tile or on a tile chosen by
+        `Game.find_route`, so the set of standing tiles is closed over those
+        results.
+        """
+        player = game.spawn_player()
+        positions = [(player.x, player.y)]
+        index = {positions[0]: 0}
+        dist_rows: list[list[int]] = []
+        appr_rows: list[list[int]] = []
+        i = 0
+        while i < len(positions):
+            px, py = positions[i]
+            dist_row, appr_row = [], []
+            for tx, ty in self.targets:
+                d, pos = game.find_route((px, py), (tx, ty))
+                if d == -1:
+                    dist_row.append(-1)
+                    appr_row.append(-1)
+                    continue
+                key = (pos.x, pos.y)
+                if key not in index:
+                    index[key] = len(positions)
+                    positions.append(key)
+                dist_row.append(d)
+                appr_row.append(index[key])
+            dist_rows.append(dist_row)
+            appr_rows.append(appr_row)
+            i += 1
+        shape = (len(positions), len(self.targets))
+        distance = np.array(dist_rows, dtype=np.int64).reshape(shape)
+        approach = np.array(appr_rows, dtype=np.int64).reshape(shape)
+        return positions, distance, approach
+
+    def encode(self, command: str) -> int:
+        """Map a text-mode command to an action id (`NOOP` if it does nothing)."""
+        cmd = command.strip().lower()
+        if cmd == "skip":
+            return self.SKIP
+        if cmd == "drop":
+            return self.DROP
+        m = re.match(r"interact\s*\(\s*(-?\d+)\s*,\s*(-?\d+)\s*\)", cmd)
+        if m:
+            return self.target_index.get((int(m.group(1)), int(m.group(2))), self.NOOP)
+        return self.NOOP
+
+    # --- per-instance state ---
+
+    def reset(self) -> VecStepResult:
+        """Put every instance back to the level start."""
+        n, a = self.num_envs, self.num_appliances
+        self.player_pos = np.zeros(n, dtype=np.int64)
+        self.game_time = np.zeros(n, dtype=np.int64)
+        self.inventory = np.full(n, EMPTY, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.progress = np.full((n, self.goal), -1, dtype=np.int64)
+        self.contents = np.full((n, a, MAX_CONTENTS), EMPTY, dtype=np.int64)
+        self.content_count = np.zeros((n, a), dtype=np.int64)
+        self.active_op = np.full((n, a), -1, dtype=np.int64)
+        self.remaining_time = np.zeros((n, a), dtype=np.int64)
+        self.op_start_time = np.zeros((n, a), dtype=np.int64)
+        self.elapsed = np.zeros((n, self.num_dispensers), dtype=np.int64)
+        self.table_item = np.full((n, self.num_tables), EMPTY, dtype=np.int64)
+        return self._result()
+
+    def _result(self) -> VecStepResult:
+        return VecStepResult(
+            game_time=self.game_time.copy(),
+            inventory=self.inventory.copy(),
+            progress=self.progress.copy(),
+            done=self.done.copy(),
+        )
+
+    def _record_progress(self, idx: np.ndarray, items: np.ndarray, times: np.ndarray) -> None:
+        """First-time bookkeeping for item ids in 1..goal."""
+        ok = (items >= 1) & (items <= self.goal)
+        idx, col, times = idx[ok], items[ok] - 1, times[ok]
+        first = self.progress[idx, col] == -1
+        self.progress[idx[first], col[first]] = times[first]
+
+    def _try_start(self, idx: np.ndarray, app: np.ndarray, start_time: np.ndarray) -> None:
+        """Start the operation matching each appliance's contents, if any."""
+        if len(idx) == 0 or len(self._recipe_keys) == 0:
+            return
+        slots = np.sort(self.contents[idx, app], axis=1)
+        keys = app * self._key_span + self._slot_key(slots)
+        at = np.minimum(np.searchsorted(self._recipe_keys, keys), len(self._recipe_keys) - 1)
+        hit = self._recipe_keys[at] == keys
+        idx, app, op = idx[hit], app[hit], self._recipe_ops[at[hit]]
+        self.active_op[idx, app] = op
+        self.remaining_time[idx, app] = self.op_time[op]
+        self.op_start_time[idx, app] = start_time[hit]
+        self.contents[idx, app] = EMPTY
+        self.content_count[idx, app] = 0
+
+    def _advance(self, dt: np.ndarray) -> None:
+        """Advance every block of instance i by dt[i] game steps."""
+        if self.num_dispensers:
+            timed = self.dispenser_expiry >= 0
+            grown = np.minimum(self.dispenser_expiry, self.elapsed + dt[:, None])
+            self.elapsed = np.where(timed, grown, self.elapsed)
+        # one appliance at a time, so first completions are recorded in the
+        # same order as Game.tick_blocks
+        for a in range(self.num_appliances):
+            left = dt.copy()
+            while True:
+                busy = np.nonzero((self.remaining_time[:, a] > 0) & (left > 0))[0]
+                if len(busy) == 0:
+                    break
+                step = np.minimum(left[busy], self.remaining_time[busy, a])
+                self.remaining_time[busy, a] -= step
+                left[busy] -= step
+                fin = busy[(self.remaining_time[busy, a] == 0) & (self.active_op[busy, a] >= 0)]
+                if len(fin) == 0:
+                    continue
+                op = self.active_op[fin, a]
+                finish_time = self.op_start_time[fin, a] + self.op_time[op]
+                product = self.op_product[op]
+                self.contents[fin, a] = EMPTY
+                self.contents[fin, a, 0] = product
+                self.content_count[fin, a] = 1
+                self._record_progress(fin, product, finish_time)
+                self.active_op[fin, a] = -1
+                self._try_start(fin, np.full(len(fin), a), finish_time)
+
+    def _interact(self, idx: np.ndarray, target: np.ndarray) -> np.ndarray:
+        """Interact with `target` for instances `idx`; see Player.interact."""
+        changed = np.zeros(len(idx), dtype=bool)
+        kind = self.target_kind[target]
+        local = self.target_local[target]
+        held = self.inventory[idx]
+
+        # tables: take, place or swap (always counts as a change)
+        m = np.nonzero(kind == TABLE)[0]
+        if len(m):
+            i, t = idx[m], local[m]
+            self.inventory[i], self.table_item[i, t] = self.table_item[i, t], held[m]
+            changed[m] = True
+
+        # dispensers: take an item if the hand is empty and it has not expired
+        m = np.nonzero((kind == DISPENSER) & (held == EMPTY))[0]
+        if len(m):
+            i, d = idx[m], local[m]
+            expiry = self.dispenser_expiry[d]
+            ok = (expiry == -1) | (self.elapsed[i, d] < expiry)
+            self.inventory[i[ok]] = self.dispenser_item[d[ok]]
+            changed[m[ok]] = True
+
+        if not self.num_appliances:
+            return changed
+
+        # appliances: take the first item when the hand is empty ...
+        a = np.where(kind == APPLIANCE, local, 0)
+        count = self.content_count[idx, a]
+        m = np.nonzero((kind == APPLIANCE) & (held == EMPTY) & (count > 0))[0]
+        if len(m):
+            i, ap = idx[m], a[m]
+            self.inventory[i] = self.contents[i, ap, 0]
+            self.contents[i, ap, :-1] = self.contents[i, ap, 1:]
+            self.contents[i, ap, -1] = EMPTY
+            self.content_count[i, ap] -= 1
+            changed[m] = True
+
+        # ... or place the held item when there is room and nothing is running
+        m = np.nonzero(
+            (kind == APPLIANCE) & (held != EMPTY) & (count < MAX_CONTENTS) & (self.active_op[idx, a] < 0)
+        )[0]
+        if len(m):
+            i, ap = idx[m], a[m]
+            self.contents[i, ap, self.content_count[i, ap]] = held[m]
+            self.content_count[i, ap] += 1
+            self._try_start(i, ap, self.game_time[i])
+            self.inventory[i] = EMPTY
+            changed[m] = True
+        return changed
+
+    def step(self, actions) -> VecStepResult:
+        """Apply one action per instance; finished instances ignore theirs."""
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.num_envs,):
+            raise ValueError(f"expected {self.num_envs} actions, got shape {actions.shape}")
+        live = ~self.done
+
+        skip = live & (actions == self.SKIP)
+        self.game_time += skip
+        self._advance(skip.astype(np.int64))
+
+        self.inventory[live & (actions == self.DROP)] = EMPTY
+
+        idx = np.nonzero(live & (actions >= 0) & (actions < self.SKIP))[0]
+        target = actions[idx]
+        dist = self.distance[self.player_pos[idx], target]
+        reachable = dist >= 0
+        idx, target, dist = idx[reachable], target[reachable], dist[reachable]
+        if len(idx) == 0:
+            return self._result()
+
+        dt = np.zeros(self.num_envs, dtype=np.int64)
+        dt[idx] = dist
+        self.game_time += dt
+        self._advance(dt)
+        self.player_pos[idx] = self.approach[self.player_pos[idx], target]
+
+        changed = self._interact(idx, target)
+        self._record_progress(idx, self.inventory[idx], self.game_time[idx])
+
+        # busy appliance: wait for the running operation, then retry once
+        # (like the text mode, the retry does not update progress)
+        kind = self.target_kind[target]
+        busy = np.nonzero(~changed & (kind == APPLIANCE))[0]
+        wait = self.remaining_time[idx[busy], self.target_local[target[busy]]]
+        retry = busy[wait > 0]
+        wait = wait[wait > 0]
+        if len(retry):
+            dt[:] = 0
+            dt[idx[retry]] = wait
+            self.game_time += dt
+            self._advance(dt)
+            changed[retry] = self._interact(idx[retry], target[retry])
+
+        reached = changed & (self.inventory[idx] == self.goal)
+        self.done[idx[reached]] = True
+        return self._result()